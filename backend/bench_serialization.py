@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Response serialization microbenchmark
+Compares the per-document cost of the previous response path (clean_mongo_doc
+walk + FastAPI's jsonable_encoder + json.dumps) with the projection + orjson
+path used by the list routes, on payloads of N payment documents.
+
+Usage:
+    python bench_serialization.py --docs 10000 --repeat 5
+"""
+
+import argparse
+import json
+import uuid
+from datetime import datetime, timezone
+from time import perf_counter
+
+import orjson
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+
+
+# Previous response path, kept here as the baseline
+def clean_mongo_doc(doc):
+    if isinstance(doc, dict):
+        if '_id' in doc:
+            del doc['_id']
+        for key, value in doc.items():
+            if isinstance(value, dict):
+                doc[key] = clean_mongo_doc(value)
+            elif isinstance(value, list):
+                doc[key] = [clean_mongo_doc(item) if isinstance(item, dict) else item for item in value]
+    return doc
+
+
+def legacy_path(docs):
+    cleaned = [clean_mongo_doc(doc) for doc in docs]
+    return json.dumps(jsonable_encoder(cleaned), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def fast_path(docs):
+    return orjson.dumps(docs)
+
+
+def make_payments(count, with_id):
+    concept = {
+        "id": str(uuid.uuid4()), "name": "Mantenimiento", "description": "Cuota mensual de mantenimiento",
+        "base_amount": 280.0, "is_variable": False, "frequency": "MENSUAL", "is_mandatory": True,
+        "building_id": str(uuid.uuid4()),
+    }
+    docs = []
+    for _ in range(count):
+        doc = {
+            "id": str(uuid.uuid4()), "resident_id": str(uuid.uuid4()), "concept_id": concept["id"],
+            "amount": 280.0, "due_date": "2025-09-15", "status": "PENDIENTE", "paid_date": None,
+            "building_id": concept["building_id"], "created_at": datetime.now(timezone.utc).isoformat(),
+            "concept": dict(concept, _id=ObjectId()) if with_id else dict(concept),
+        }
+        if with_id:
+            doc["_id"] = ObjectId()
+        docs.append(doc)
+    return docs
+
+
+def measure(label, build, serialize, count, repeat):
+    timings = []
+    for _ in range(repeat):
+        docs = build(count)
+        started = perf_counter()
+        body = serialize(docs)
+        timings.append(perf_counter() - started)
+    best = min(timings)
+    print(f"{label:>10}: {best * 1000:8.2f} ms total, {best * 1e6 / count:6.2f} us/doc, {len(body) / 1024:.0f} KiB")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response serialization paths")
+    parser.add_argument("--docs", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Serializing {args.docs} payment documents (best of {args.repeat})")
+    before = measure("before", lambda n: make_payments(n, with_id=True), legacy_path, args.docs, args.repeat)
+    after = measure("after", lambda n: make_payments(n, with_id=False), fast_path, args.docs, args.repeat)
+    print(f"{'speedup':>10}: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Billing run
+Generates the payments of a period for every resident of one or all buildings.
+Reruns of the same period are no-ops. Reports throughput in payments/second.
+
+Usage:
+    python billing.py --period 2025-10 --building-id <id>
+    python billing.py --period 2025-10 --all-buildings
+
+To measure a 10k-unit building:
+    python seed.py --units 10000 --months 0 && python billing.py --all-buildings
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+
+from server import BILLING_BATCH_SIZE, create_mongo_client, ensure_indexes, run_billing
+
+
+async def bill(args):
+    client = create_mongo_client(args.mongo_url)
+    database = client[args.db_name]
+    await ensure_indexes(database)
+
+    if args.all_buildings:
+        building_ids = await database.buildings.distinct("id")
+    else:
+        building_ids = [args.building_id]
+
+    total = 0
+    for building_id in building_ids:
+        run = await run_billing(database, building_id, args.period, args.batch_size)
+        total += run["inserted"]
+        print(f"{building_id}: {run['residents']} residents x {run['concepts']} concepts -> "
+              f"{run['inserted']} inserted, {run['skipped']} already billed in {run['duration_ms']:.0f} ms "
+              f"({run['payments_per_second']} payments/s)")
+    print(f"Period {args.period}: {total} payments generated for {len(building_ids)} building(s)")
+    client.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a period's payments from payment concepts")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--building-id")
+    target.add_argument("--all-buildings", action="store_true")
+    parser.add_argument("--period", default=datetime.now(timezone.utc).strftime("%Y-%m"), help="YYYY-MM")
+    parser.add_argument("--batch-size", type=int, default=BILLING_BATCH_SIZE, help="payments per insert_many call")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME"))
+    args = parser.parse_args(argv)
+    if not args.mongo_url or not args.db_name:
+        parser.error("--mongo-url/--db-name (or MONGO_URL/DB_NAME) are required")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(bill(parse_args()))
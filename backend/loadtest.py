@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Load test and benchmark suite
+Seeds scaled data with seed.py, drives every /api route in-process through
+httpx's ASGI transport with concurrent clients, and reports p50/p95/p99
+latency and throughput per route. Runs against mongomock by default, or a
+local mongod with --mongo-url (the --db-name database is dropped first).
+
+Write routes get fresh fixtures for every request (a closed voting to vote
+on, a pending payment to pay, a free slot to book, a booking to cancel), so
+they measure the write path instead of the unique-index rejection.
+
+Results can be stored as a baseline and later runs checked against it; a
+route whose p95 grows beyond the tolerance fails the check. Baselines are
+keyed by backend and data scale, and only compare runs on the same machine.
+With mongomock the numbers include mongomock's own costs: its aggregate
+copies the whole collection, so routes bound by an aggregate are marked in
+the report and left out of --check. Use a mongod for absolute figures.
+
+Usage:
+    python loadtest.py --units 100 --requests 100 --concurrency 16
+    python loadtest.py --update-baseline
+    python loadtest.py --check --tolerance 0.25
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import sys
+from datetime import timedelta
+from pathlib import Path
+from time import perf_counter
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "edificio_loadtest")
+
+import httpx
+
+import server
+from seed import BulkInserter, seed_building
+
+# Per-request logs would drown the report
+logging.getLogger("httpx").setLevel(logging.WARNING)
+logging.getLogger("server.trace").setLevel(logging.ERROR)
+
+DEFAULT_BASELINE = Path(__file__).parent / "loadtest_baseline.json"
+# Sub-millisecond routes are too noisy for a relative tolerance alone
+MIN_REGRESSION_MS = 1.0
+# Routes whose cost under mongomock is mostly its aggregate copying the
+# collection; their numbers say little about the handler
+MONGOMOCK_AGGREGATE_ROUTES = {"GET /api/resident/dashboard"}
+# Write fixtures book days past the seeded reservations (-30..+30 days)
+FIXTURE_FIRST_DAY = 100
+
+
+def build_routes(context):
+    # (name, method, path, json body, fixture) for each route exercised; names
+    # are the route templates so reports line up with /metrics. Routes with a
+    # fixture get one fresh value per request, and path/body are callables
+    # building the request from it. Writes run last so reads see seeded data.
+    area_id = context["area_id"]
+    voting_id = context["voting_id"]
+    return [
+        ("GET /api/init-demo", "GET", "/api/init-demo", None, None),
+        ("GET /api/resident/dashboard", "GET", "/api/resident/dashboard", None, None),
+        ("GET /api/payments", "GET", "/api/payments", None, None),
+        ("GET /api/common-areas", "GET", "/api/common-areas", None, None),
+        ("GET /api/common-areas/{area_id}/availability", "GET", f"/api/common-areas/{area_id}/availability", None, None),
+        ("GET /api/reservations/{area_id}", "GET", f"/api/reservations/{area_id}", None, None),
+        ("GET /api/votings", "GET", "/api/votings", None, None),
+        ("GET /api/votings/{voting_id}/results", "GET", f"/api/votings/{voting_id}/results", None, None),
+        ("GET /api/incidents", "GET", "/api/incidents", None, None),
+        ("GET /api/admin/financial-summary", "GET", "/api/admin/financial-summary", None, None),
+        ("POST /api/incidents", "POST", "/api/incidents", {
+            "title": "Prueba de carga", "description": "Incidencia generada por loadtest.py",
+            "category": "Mantenimiento", "priority": "BAJA",
+        }, None),
+        ("POST /api/vote", "POST", "/api/vote",
+         lambda voting: {"voting_id": voting, "option": "A FAVOR"}, closed_votings),
+        ("POST /api/payments/{payment_id}/pay", "POST",
+         lambda payment: f"/api/payments/{payment}/pay", None, pending_payments),
+        ("POST /api/reservations", "POST", "/api/reservations", lambda booking: booking, free_bookings),
+        ("POST /api/reservations/{reservation_id}/cancel", "POST",
+         lambda reservation: f"/api/reservations/{reservation}/cancel", None, confirmed_reservations),
+    ]
+
+
+# Write fixtures: each returns `count` values, one per request
+async def closed_votings(database, context, count):
+    # Closed votings stay out of the active lists the read routes return;
+    # cast_vote accepts them, so the demo resident can vote once in each
+    votings = [server.Voting(title=f"Carga {index}", description="Votación generada por loadtest.py",
+                             start_date="2024-01-01", end_date="2024-01-08", status=server.VotingStatus.CERRADA,
+                             options=["A FAVOR", "EN CONTRA"], building_id=context["building_id"],
+                             created_by=context["resident_id"]) for index in range(count)]
+    await database.votings.insert_many([server.prepare_for_mongo(voting.dict()) for voting in votings])
+    return [voting.id for voting in votings]
+
+
+async def pending_payments(database, context, count):
+    concept = await database.payment_concepts.find_one({"building_id": context["building_id"]}, {"_id": 0, "id": 1})
+    payments = [server.Payment(resident_id=context["resident_id"], concept_id=concept["id"], amount=100.0,
+                               due_date="2024-01-15", status=server.PaymentStatus.PENDIENTE,
+                               building_id=context["building_id"]) for _ in range(count)]
+    await database.payments.insert_many([server.prepare_for_mongo(payment.dict()) for payment in payments])
+    return [payment.id for payment in payments]
+
+
+def booking_body(context, day):
+    # One hour at opening time on a day nobody has booked
+    area = context["area"]
+    hour = int(area["opening_time"][:2])
+    return {
+        "common_area_id": area["id"],
+        "date": (server.today_utc() + timedelta(days=day)).strftime("%Y-%m-%d"),
+        "start_time": f"{hour:02d}:00",
+        "end_time": f"{hour + 1:02d}:00",
+        "total_cost": area["price_per_hour"],
+    }
+
+
+async def free_bookings(database, context, count):
+    return [booking_body(context, next(context["days"])) for _ in range(count)]
+
+
+async def confirmed_reservations(database, context, count):
+    reservations = []
+    for _ in range(count):
+        body = booking_body(context, next(context["days"]))
+        reservations.append(server.Reservation(
+            common_area_id=body["common_area_id"], resident_id=context["resident_id"], date=body["date"],
+            start_time=body["start_time"], end_time=body["end_time"],
+            status=server.ReservationStatus.CONFIRMADA, total_cost=body["total_cost"]))
+    await database.reservations.insert_many([server.prepare_for_mongo(r.dict()) for r in reservations])
+    await database.reservation_slots.insert_many(
+        [slot for r in reservations for slot in server.reservation_slot_documents(r.dict())])
+    server.availability_index.invalidate()
+    return [reservation.id for reservation in reservations]
+
+
+async def prepare_database(args):
+    if args.mongo_url:
+        client = server.create_mongo_client(args.mongo_url, event_listeners=[server.command_metrics])
+        await client.drop_database(args.db_name)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+    database = client[args.db_name]
+
+    started = perf_counter()
+    inserter = BulkInserter(database, batch_size=1000, concurrency=4)
+    rng = random.Random(args.random_seed)
+    for index in range(args.buildings):
+        await seed_building(inserter, rng, index, args.units, args.months, 1, 2)
+    await inserter.close()
+    await server.ensure_indexes(database)
+    if args.mongo_url:
+        await server.rebuild_financial_summaries(database)
+    else:
+        # mongomock has no $merge, so the summaries are written from the pipeline
+        summaries = await database.payments.aggregate(server.financial_summary_pipeline()).to_list(None)
+        await database.financial_summaries.insert_many(summaries)
+
+    # The first seeded building plays the demo building, so the demo routes
+    # read the scaled data; the marker keeps init-demo from seeding another
+    building = await database.buildings.find_one({"name": "Edificio Carga 1"}, {"_id": 0, "id": 1})
+    await database.buildings.update_one({"id": building["id"]}, {"$set": {"is_demo": True}})
+    await database.init_state.update_one({"_id": "demo_data"}, {"$set": {"version": server.SEED_VERSION}}, upsert=True)
+    area = await database.common_areas.find_one({"building_id": building["id"]}, server.COMMON_AREA_PROJECTION)
+    voting = await database.votings.find_one({"building_id": building["id"]}, {"_id": 0, "id": 1})
+    print(f"Seeded {sum(inserter.counts.values())} documents in {perf_counter() - started:.1f}s")
+
+    server.db = database
+    server.invalidate_demo_context()
+    server.forget_demo_seed()
+    server.availability_index.invalidate()
+    _, resident = await server.get_demo_context()
+    return client, {
+        "area_id": area["id"], "voting_id": voting["id"], "area": area,
+        "building_id": building["id"], "resident_id": resident["id"],
+        "days": itertools.count(FIXTURE_FIRST_DAY),
+    }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+async def drive_route(http, method, path, body, requests, concurrency, fixtures=None):
+    latencies = []
+    statuses = {}
+    remaining = iter(range(requests))
+
+    async def worker():
+        for index in remaining:
+            value = fixtures[index] if fixtures else None
+            target = path(value) if callable(path) else path
+            payload = body(value) if callable(body) else body
+            started = perf_counter()
+            response = await http.request(method, target, json=payload)
+            latencies.append((perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+async def run_benchmark(args):
+    client, context = await prepare_database(args)
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as http:
+            for name, method, path, body, fixture in build_routes(context):
+                if args.routes and not any(pattern in name for pattern in args.routes):
+                    continue
+                warmup = await fixture(server.db, context, args.warmup) if fixture else None
+                await drive_route(http, method, path, body, args.warmup, 1, warmup)
+                measured = await fixture(server.db, context, args.requests) if fixture else None
+                results[name] = await drive_route(http, method, path, body, args.requests, args.concurrency, measured)
+    finally:
+        client.close()
+    return results
+
+
+def profile_key(args):
+    backend = "mongod" if args.mongo_url else "mongomock"
+    return f"{backend}:{args.buildings}x{args.units}x{args.months}:c{args.concurrency}"
+
+
+def find_regressions(results, baseline, tolerance, skip=()):
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or name in skip:
+            continue
+        limit = max(previous["p95_ms"] * (1 + tolerance), previous["p95_ms"] + MIN_REGRESSION_MS)
+        if result["p95_ms"] > limit:
+            regressions.append((name, previous["p95_ms"], result["p95_ms"]))
+    return regressions
+
+
+def unchecked_routes(args):
+    return set() if args.mongo_url else MONGOMOCK_AGGREGATE_ROUTES
+
+
+def print_report(results, unchecked=()):
+    print(f"{'route':<48} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>9}  statuses")
+    for name, result in results.items():
+        label = f"{name} *" if name in unchecked else name
+        print(f"{label:<48} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+              f"{result['rps']:>9.1f}  {result['statuses']}")
+    if unchecked & set(results):
+        print("* bound by mongomock's aggregate, not checked for regressions; use --mongo-url for real figures")
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = asyncio.run(run_benchmark(args))
+    unchecked = unchecked_routes(args)
+    print_report(results, unchecked)
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    key = profile_key(args)
+    if args.update_baseline:
+        baselines[key] = {**baselines.get(key, {}), **results}
+        args.baseline.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline {key} written to {args.baseline}")
+    if args.check:
+        if key not in baselines:
+            print(f"No baseline for {key}; run with --update-baseline first")
+            return 1
+        regressions = find_regressions(results, baselines[key], args.tolerance, unchecked)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: p95 {before:.2f} ms -> {after:.2f} ms")
+        if regressions:
+            return 1
+        print(f"No p95 regressions beyond {args.tolerance:.0%} against {key}")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the /api routes with concurrent clients")
+    parser.add_argument("--buildings", type=int, default=1)
+    parser.add_argument("--units", type=int, default=100, help="residents per building")
+    parser.add_argument("--months", type=int, default=12, help="months of payment history per unit")
+    parser.add_argument("--requests", type=int, default=100, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=10, help="unmeasured requests per route")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent clients per route")
+    parser.add_argument("--routes", nargs="*", help="only routes whose name contains one of these")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--mongo-url", help="benchmark against this mongod instead of mongomock")
+    parser.add_argument("--db-name", default="edificio_loadtest", help="database to seed (dropped first)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 when a route's p95 regresses")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 growth")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Date storage migration
+Rewrites dates stored as strings ("YYYY-MM-DD" or ISO timestamps) into native
+BSON dates, walking each collection by _id in batches of bulk updates.
+
+Usage:
+    python migrate_dates.py [--batch-size 1000] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from time import perf_counter
+
+from pymongo import ASCENDING, UpdateOne
+
+from server import create_mongo_client, ensure_indexes
+
+# Fields holding a date or timestamp, per collection
+DATE_FIELDS_BY_COLLECTION = {
+    "buildings": ["created_at"],
+    "users": ["created_at"],
+    "payments": ["due_date", "paid_date", "created_at"],
+    "reservations": ["date", "created_at"],
+    "reservation_slots": ["date"],
+    "votings": ["start_date", "end_date", "created_at"],
+    "votes": ["created_at"],
+    "incidents": ["created_at"],
+}
+
+
+def parse_stored_date(value):
+    try:
+        if len(value) == 10:
+            return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_collection(collection, fields, batch_size, dry_run):
+    query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+    projection = {field: 1 for field in fields}
+    migrated = skipped = 0
+    last_id = None
+
+    while True:
+        page_query = query if last_id is None else {"$and": [query, {"_id": {"$gt": last_id}}]}
+        docs = await collection.find(page_query, projection).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        updates = []
+        for doc in docs:
+            changes = {}
+            for field in fields:
+                if isinstance(doc.get(field), str):
+                    parsed = parse_stored_date(doc[field])
+                    if parsed is not None:
+                        changes[field] = parsed
+            if changes:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+            else:
+                skipped += 1
+        if updates and not dry_run:
+            await collection.bulk_write(updates, ordered=False)
+        migrated += len(updates)
+
+    return migrated, skipped
+
+
+async def migrate(args):
+    client = create_mongo_client(args.mongo_url)
+    database = client[args.db_name]
+
+    started = perf_counter()
+    for collection_name, fields in DATE_FIELDS_BY_COLLECTION.items():
+        migrated, skipped = await migrate_collection(database[collection_name], fields, args.batch_size, args.dry_run)
+        print(f"{collection_name:>18}: {migrated} migrated, {skipped} unparseable")
+
+    if not args.dry_run:
+        await ensure_indexes(database)
+    client.close()
+    print(f"{'Dry run' if args.dry_run else 'Migration'} finished in {perf_counter() - started:.2f}s")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Convert string dates into native BSON dates")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per bulk_write")
+    parser.add_argument("--dry-run", action="store_true", help="count documents without writing")
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME"))
+    args = parser.parse_args(argv)
+    if not args.mongo_url or not args.db_name:
+        parser.error("--mongo-url/--db-name (or MONGO_URL/DB_NAME) are required")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate(parse_args()))
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Synthetic data generator
+Seeds N buildings x M units with residents, payments, reservations, votings,
+votes and incidents using batched insert_many calls, for load testing.
+
+Usage:
+    python seed.py --buildings 10 --units 1000 --months 12
+"""
+
+import argparse
+import asyncio
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+
+from pymongo.errors import BulkWriteError
+
+from server import (
+    Building, User, Resident, Property, CommonArea, PaymentConcept, Payment,
+    Reservation, Voting, Vote, Incident,
+    UserRole, PaymentStatus, ReservationStatus, VotingStatus, IncidentStatus, Priority,
+    prepare_for_mongo, create_mongo_client, ensure_indexes, reservation_slot_documents, rebuild_financial_summaries,
+)
+
+FIRST_NAMES = ["Juan", "María", "Carlos", "Lucía", "Jorge", "Ana", "Luis", "Rosa", "Pedro", "Carmen",
+               "Miguel", "Sofía", "José", "Valeria", "Diego", "Camila", "Andrés", "Daniela"]
+LAST_NAMES = ["Pérez", "García", "Rodríguez", "Flores", "Torres", "Quispe", "Ramírez", "Mendoza",
+              "Castillo", "Rojas", "Vargas", "Chávez", "Huamán", "Salazar", "Gutiérrez", "Díaz"]
+
+AREA_TEMPLATES = [
+    ("Gimnasio", "Gimnasio completamente equipado", 15, 25.0, 6, 22),
+    ("Piscina", "Piscina climatizada para adultos", 30, 40.0, 8, 20),
+    ("Salón Social", "Salón para eventos y reuniones", 50, 60.0, 9, 23),
+    ("Co-working", "Espacio de trabajo compartido", 12, 15.0, 7, 21),
+]
+
+CONCEPT_TEMPLATES = [
+    ("Mantenimiento", "Cuota mensual de mantenimiento", 280.0, False),
+    ("Agua", "Servicio de agua potable", 45.0, True),
+    ("Luz Común", "Electricidad áreas comunes", 35.0, True),
+    ("Seguridad", "Servicio de seguridad 24/7", 120.0, False),
+]
+
+INCIDENT_TEMPLATES = [
+    ("Fuga de agua", "Plomería"),
+    ("Luz quemada en pasillo", "Electricidad"),
+    ("Ascensor detenido", "Mantenimiento"),
+    ("Ruidos molestos", "Convivencia"),
+    ("Puerta de cochera atascada", "Seguridad"),
+]
+
+VOTING_OPTIONS = ["A FAVOR", "EN CONTRA", "ABSTENCIÓN"]
+
+
+class BulkInserter:
+    # Buffers documents per collection and flushes them with unordered
+    # insert_many calls, keeping at most `concurrency` batches in flight.
+    def __init__(self, database, batch_size, concurrency):
+        self.database = database
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.buffers = {}
+        self.counts = {}
+        self.pending = set()
+
+    async def add(self, collection_name, document):
+        if not isinstance(document, dict):
+            document = prepare_for_mongo(document.dict())
+        buffer = self.buffers.setdefault(collection_name, [])
+        buffer.append(document)
+        if len(buffer) >= self.batch_size:
+            await self._flush(collection_name)
+
+    async def _flush(self, collection_name):
+        batch = self.buffers.pop(collection_name, [])
+        if not batch:
+            return
+        if len(self.pending) >= self.concurrency:
+            done, self.pending = await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        self.pending.add(asyncio.ensure_future(self._insert(collection_name, batch)))
+
+    async def _insert(self, collection_name, batch):
+        try:
+            result = await self.database[collection_name].insert_many(batch, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            # Duplicate keys are expected when re-running over existing data
+            errors = [err for err in e.details["writeErrors"] if err["code"] != 11000]
+            if errors:
+                raise
+            inserted = e.details["nInserted"]
+        self.counts[collection_name] = self.counts.get(collection_name, 0) + inserted
+
+    async def close(self):
+        for collection_name in list(self.buffers):
+            await self._flush(collection_name)
+        if self.pending:
+            await asyncio.gather(*self.pending)
+            self.pending = set()
+
+
+def month_start(date, months_back):
+    month = date.month - months_back
+    year = date.year + (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return date.replace(year=year, month=month, day=1)
+
+
+async def seed_building(inserter, rng, index, units, months, reservations_per_unit, votings):
+    now = datetime.now(timezone.utc)
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    building = Building(
+        name=f"Edificio Carga {index + 1}",
+        address=f"Av. Prueba {100 + index}, Lima",
+        total_units=units,
+        is_demo=False
+    )
+    await inserter.add("buildings", building)
+    building_id = building.id
+
+    admin = User(username=f"admin_{index + 1}", email=f"admin{index + 1}@carga.com",
+                 role=UserRole.ADMINISTRADOR, building_id=building_id)
+    await inserter.add("users", admin)
+
+    areas = []
+    for name, description, capacity, price, opening, closing in AREA_TEMPLATES:
+        area = CommonArea(name=name, description=description, capacity=capacity, price_per_hour=price,
+                          opening_time=f"{opening:02d}:00", closing_time=f"{closing:02d}:00",
+                          building_id=building_id)
+        areas.append((area, opening, closing))
+        await inserter.add("common_areas", area)
+
+    concepts = []
+    for name, description, amount, is_variable in CONCEPT_TEMPLATES:
+        concept = PaymentConcept(name=name, description=description, base_amount=amount,
+                                 is_variable=is_variable, frequency="MENSUAL", building_id=building_id)
+        concepts.append(concept)
+        await inserter.add("payment_concepts", concept)
+
+    resident_ids = []
+    booked_slots = set()
+    for unit in range(units):
+        floor = unit // 10 + 1
+        unit_number = f"{floor}{unit % 10 + 1:02d}"
+        user = User(username=f"residente_{index + 1}_{unit_number}", email=f"r{index + 1}_{unit_number}@carga.com",
+                    role=UserRole.RESIDENTE, building_id=building_id)
+        await inserter.add("users", user)
+
+        resident = Resident(user_id=user.id, first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                            phone=f"+51 9{rng.randint(10000000, 99999999)}", unit_number=unit_number,
+                            building_id=building_id)
+        resident_ids.append(resident.id)
+        await inserter.add("residents", resident)
+
+        area_m2 = round(rng.uniform(55, 140), 2)
+        await inserter.add("properties", Property(unit_number=unit_number, floor=floor, area_m2=area_m2,
+                                                  property_value=round(area_m2 * rng.uniform(3800, 4600), 2),
+                                                  building_id=building_id, resident_id=resident.id))
+
+        # One payment per concept and month; the current month is still open
+        for months_back in range(months):
+            due_date = month_start(today, months_back) + timedelta(days=14)
+            for concept in concepts:
+                amount = concept.base_amount
+                if concept.is_variable:
+                    amount = round(amount * rng.uniform(0.8, 1.3), 2)
+                paid_date = None
+                if months_back == 0:
+                    status = PaymentStatus.PENDIENTE
+                elif rng.random() < 0.9:
+                    status = PaymentStatus.PAGADO
+                    paid_date = (due_date - timedelta(days=rng.randint(0, 10))).strftime("%Y-%m-%d")
+                else:
+                    status = PaymentStatus.VENCIDO
+                await inserter.add("payments", Payment(resident_id=resident.id, concept_id=concept.id, amount=amount,
+                                                       due_date=due_date.strftime("%Y-%m-%d"), status=status,
+                                                       paid_date=paid_date, building_id=building_id))
+
+        # Reservations never overlap within the same area and day
+        for _ in range(reservations_per_unit):
+            area, opening, closing = rng.choice(areas)
+            date = (today + timedelta(days=rng.randint(-30, 30))).strftime("%Y-%m-%d")
+            hour = rng.randint(opening, closing - 2)
+            duration = rng.randint(1, 2)
+            slots = {(area.id, date, h) for h in range(hour, hour + duration)}
+            if slots & booked_slots:
+                continue
+            booked_slots |= slots
+            reservation = Reservation(
+                common_area_id=area.id, resident_id=resident.id, date=date,
+                start_time=f"{hour:02d}:00", end_time=f"{hour + duration:02d}:00",
+                status=ReservationStatus.CONFIRMADA, total_cost=area.price_per_hour * duration)
+            await inserter.add("reservations", reservation)
+            for slot in reservation_slot_documents(reservation.dict()):
+                await inserter.add("reservation_slots", slot)
+
+        if rng.random() < 0.3:
+            title, category = rng.choice(INCIDENT_TEMPLATES)
+            await inserter.add("incidents", Incident(
+                title=title, description=f"{title} reportado en la unidad {unit_number}.", category=category,
+                priority=rng.choice(list(Priority)),
+                status=rng.choice([IncidentStatus.ABIERTA, IncidentStatus.EN_PROCESO, IncidentStatus.RESUELTA]),
+                reported_by=resident.id, building_id=building_id))
+
+    for number in range(votings):
+        active = number == 0
+        start = today - timedelta(days=0 if active else 30 * number)
+        voting = Voting(title=f"Consulta {number + 1}: mejoras en áreas comunes",
+                        description="Propuesta generada para pruebas de carga.",
+                        start_date=start.strftime("%Y-%m-%d"),
+                        end_date=(start + timedelta(days=7)).strftime("%Y-%m-%d"),
+                        status=VotingStatus.ACTIVA if active else VotingStatus.CERRADA,
+                        options=VOTING_OPTIONS, building_id=building_id, created_by=admin.id)
+        await inserter.add("votings", voting)
+        # The results route reads vote_tallies, so the counters are written
+        # along with the votes instead of being rebuilt afterwards
+        counts = {}
+        for resident_id in resident_ids:
+            if rng.random() < 0.6:
+                option = rng.choice(VOTING_OPTIONS)
+                await inserter.add("votes", Vote(voting_id=voting.id, resident_id=resident_id, option=option))
+                key = str(VOTING_OPTIONS.index(option))
+                counts[key] = counts.get(key, 0) + 1
+        await inserter.add("vote_tallies", {"voting_id": voting.id, "counts": counts, "total": sum(counts.values())})
+
+
+async def seed(args):
+    client = create_mongo_client(args.mongo_url)
+    database = client[args.db_name]
+    rng = random.Random(args.random_seed)
+    inserter = BulkInserter(database, args.batch_size, args.concurrency)
+
+    started = perf_counter()
+    for index in range(args.buildings):
+        await seed_building(inserter, rng, index, args.units, args.months,
+                            args.reservations_per_unit, args.votings)
+    await inserter.close()
+    elapsed = perf_counter() - started
+
+    # Building indexes after the bulk load is cheaper than maintaining them during it
+    await ensure_indexes(database)
+    await rebuild_financial_summaries(database)
+    client.close()
+
+    total = sum(inserter.counts.values())
+    for collection_name, count in sorted(inserter.counts.items()):
+        print(f"{collection_name:>18}: {count}")
+    print(f"Inserted {total} documents in {elapsed:.2f}s ({total / max(elapsed, 1e-9):.0f} docs/s)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Seed synthetic buildings for load testing")
+    parser.add_argument("--buildings", type=int, default=1, help="number of buildings to create")
+    parser.add_argument("--units", type=int, default=100, help="units (residents) per building")
+    parser.add_argument("--months", type=int, default=12, help="months of payment history per unit")
+    parser.add_argument("--reservations-per-unit", type=int, default=2)
+    parser.add_argument("--votings", type=int, default=3, help="votings per building")
+    parser.add_argument("--batch-size", type=int, default=1000, help="documents per insert_many call")
+    parser.add_argument("--concurrency", type=int, default=4, help="insert_many calls in flight")
+    parser.add_argument("--random-seed", type=int, default=42)
+    parser.add_argument("--mongo-url", default=os.environ.get("MONGO_URL"))
+    parser.add_argument("--db-name", default=os.environ.get("DB_NAME"))
+    args = parser.parse_args(argv)
+    if not args.mongo_url or not args.db_name:
+        parser.error("--mongo-url/--db-name (or MONGO_URL/DB_NAME) are required")
+    return args
+
+
+if __name__ == "__main__":
+    asyncio.run(seed(parse_args()))
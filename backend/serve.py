@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+AdminEdificios Pro - Multi-worker server
+Runs the API under uvicorn with N worker processes. Only one worker performs
+the one-time startup work (indexes, slot backfill, demo seed); the rest wait
+on the startup lock and skip it.
+
+With --benchmark the server is started in a child process, /api/health/ready
+is polled until every worker has answered, and the cold-start time of each
+worker is printed before the server is stopped.
+
+Usage:
+    python serve.py --workers 8 --port 8001
+    python serve.py --workers 8 --benchmark
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter, sleep
+
+import uvicorn
+
+
+def serve(args):
+    uvicorn.run("server:app", host=args.host, port=args.port, workers=args.workers,
+                app_dir=os.path.dirname(os.path.abspath(__file__)))
+
+
+def probe(url):
+    try:
+        with urllib.request.urlopen(url, timeout=2) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError, TimeoutError, ValueError):
+        return None
+
+
+def benchmark(args):
+    url = f"http://{args.host}:{args.port}/api/health/ready"
+    command = [sys.executable, os.path.abspath(__file__), "--host", args.host, "--port", str(args.port),
+               "--workers", str(args.workers)]
+    launched = perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    workers = {}
+    first_ready = None
+    try:
+        # Connections are spread over the workers by the kernel, so keep a few
+        # probes in flight until every pid has answered
+        with ThreadPoolExecutor(max_workers=args.workers * 2) as pool:
+            while len(workers) < args.workers and perf_counter() - launched < args.timeout:
+                for body in pool.map(probe, [url] * args.workers * 2):
+                    if body and body.get("status") == "ready":
+                        first_ready = first_ready or perf_counter() - launched
+                        workers.setdefault(body["pid"], body["startup"])
+                sleep(0.05)
+    finally:
+        process.send_signal(signal.SIGINT)
+        process.wait(timeout=30)
+
+    if len(workers) < args.workers:
+        print(f"Only {len(workers)} of {args.workers} workers answered within {args.timeout}s")
+    print(f"{'pid':>8} {'role':>9} {'startup ms':>11}")
+    for pid, startup in sorted(workers.items(), key=lambda item: item[1]["duration_ms"]):
+        print(f"{pid:>8} {startup['role']:>9} {startup['duration_ms']:>11.1f}")
+    if first_ready is not None:
+        print(f"First worker ready {first_ready * 1000:.0f} ms after launch")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with several uvicorn workers")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "4")))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--benchmark", action="store_true", help="measure per-worker cold start, then exit")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for all workers (benchmark)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.benchmark:
+        benchmark(args)
+    else:
+        serve(args)
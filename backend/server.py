@@ -1,26 +1,168 @@
-from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi import FastAPI, APIRouter, Header, HTTPException, Response
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
+from starlette.datastructures import MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure, PyMongoError
+from pymongo.monitoring import CommandListener, ConnectionPoolListener
+from bson import json_util
 import os
+import asyncio
+import base64
+import binascii
+import hashlib
 import logging
+import orjson
+import socket
+import threading
+import zlib
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any
+from typing import Annotated, List, Optional, Dict, Any
+from collections import OrderedDict
+from time import monotonic, perf_counter
+from contextlib import asynccontextmanager, suppress
+from contextvars import ContextVar
 import uuid
 from datetime import datetime, timedelta, time, timezone
 from enum import Enum
 
+# Brotli is optional; without it responses are only gzip-compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
+# The client is created by the app lifespan; `client` and `db` stay None until
+# then. Pool options are read from the environment so pools can be sized per
+# uvicorn worker (total connections = workers x MONGO_MAX_POOL_SIZE).
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+client = None
+db = None
 
-# Create the main app without a prefix
-app = FastAPI()
+# Client option -> environment variable; unset variables keep pymongo defaults
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": "MONGO_MAX_POOL_SIZE",
+    "minPoolSize": "MONGO_MIN_POOL_SIZE",
+    "maxIdleTimeMS": "MONGO_MAX_IDLE_TIME_MS",
+    "waitQueueTimeoutMS": "MONGO_WAIT_QUEUE_TIMEOUT_MS",
+    "serverSelectionTimeoutMS": "MONGO_SERVER_SELECTION_TIMEOUT_MS",
+    "connectTimeoutMS": "MONGO_CONNECT_TIMEOUT_MS",
+    "socketTimeoutMS": "MONGO_SOCKET_TIMEOUT_MS",
+}
+READINESS_TIMEOUT_SECONDS = float(os.environ.get("READINESS_TIMEOUT_SECONDS", "2"))
+
+class PoolMetrics(ConnectionPoolListener):
+    # Connection pool utilization across all servers of the client. pymongo
+    # publishes these events from its own threads, hence the lock.
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.waiting = 0
+            self.max_waiting = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.checkout_wait_seconds = 0.0
+            self.max_checkout_wait_seconds = 0.0
+            self.pool_clears = 0
+            self._wait_started = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "checkouts": self.checkouts,
+                "checkout_failures": self.checkout_failures,
+                "avg_checkout_wait_ms": round(self.checkout_wait_seconds * 1000 / max(self.checkouts, 1), 3),
+                "max_checkout_wait_ms": round(self.max_checkout_wait_seconds * 1000, 3),
+                "pool_clears": self.pool_clears,
+            }
+
+    def _end_wait(self):
+        self.waiting = max(self.waiting - 1, 0)
+        started = self._wait_started.pop(threading.get_ident(), None)
+        return perf_counter() - started if started is not None else 0.0
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open = max(self.open - 1, 0)
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+            self._wait_started[threading.get_ident()] = perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self._end_wait()
+            self.checkout_failures += 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            waited = self._end_wait()
+            self.checkouts += 1
+            self.checkout_wait_seconds += waited
+            self.max_checkout_wait_seconds = max(self.max_checkout_wait_seconds, waited)
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out = max(self.checked_out - 1, 0)
+
+pool_metrics = PoolMetrics()
+
+def mongo_client_options():
+    options = {}
+    for option, variable in MONGO_CLIENT_OPTIONS.items():
+        if os.environ.get(variable):
+            options[option] = int(os.environ[variable])
+    return options
+
+def create_mongo_client(url=None, event_listeners=()):
+    return AsyncIOMotorClient(
+        url or mongo_url,
+        tz_aware=True,
+        event_listeners=[pool_metrics, *event_listeners],
+        **mongo_client_options()
+    )
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -168,57 +310,1258 @@ class Incident(BaseModel):
     images: List[str] = []
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
-# Helper function to convert datetime to string for MongoDB
+# Response models. Routes on the fast path return ORJSONResponse directly, so
+# these describe the OpenAPI schema without validating every document.
+class PaymentWithConcept(Payment):
+    concept: Optional[PaymentConcept] = None
+
+class PaymentsSummary(BaseModel):
+    pending_count: int
+    pending_total: float
+    overdue_count: int
+    overdue_total: float
+
+class ResidentDashboard(BaseModel):
+    resident: Resident
+    payments_summary: PaymentsSummary
+    upcoming_reservations: List[Reservation]
+    active_votings: List[Voting]
+    recent_incidents: List[Incident]
+
+# Date-only fields ("YYYY-MM-DD" in the API) are stored as native BSON dates at
+# midnight UTC so range queries and sorts compare dates, not strings
+DATE_FIELDS = ("due_date", "paid_date", "date", "start_date", "end_date")
+
+def to_mongo_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return value
+
+def from_mongo_date(value):
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+# Helper function to convert a document for MongoDB. Datetimes are kept native,
+# date-only strings become BSON dates and enums are stored as their values.
 def prepare_for_mongo(data):
     if isinstance(data, dict):
         for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
+            if isinstance(value, Enum):
+                data[key] = value.value
+        for key in DATE_FIELDS:
+            if isinstance(data.get(key), str):
+                data[key] = to_mongo_date(data[key])
     return data
 
-# Helper function to clean MongoDB documents for JSON serialization
-def clean_mongo_doc(doc):
-    if isinstance(doc, dict):
-        # Remove MongoDB's _id field to avoid ObjectId serialization issues
-        if '_id' in doc:
-            del doc['_id']
-        # Recursively clean nested documents
-        for key, value in doc.items():
-            if isinstance(value, dict):
-                doc[key] = clean_mongo_doc(value)
-            elif isinstance(value, list):
-                doc[key] = [clean_mongo_doc(item) if isinstance(item, dict) else item for item in value]
+# Helper function to render stored date-only fields back as "YYYY-MM-DD"
+def serialize_dates(doc):
+    for key in DATE_FIELDS:
+        if isinstance(doc.get(key), datetime):
+            doc[key] = doc[key].strftime("%Y-%m-%d")
     return doc
 
+# Helper function returning today's date (midnight UTC) for date range queries
+def today_utc():
+    return datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+
+# Helper function to build a projection returning exactly a model's fields.
+# Excluding _id at the query means documents never need cleaning afterwards.
+def projection_for(model):
+    return {"_id": 0, **{field: 1 for field in model.model_fields}}
+
+# Helper function for the fast response path: documents are already plain
+# JSON-ready dicts thanks to projections, so they go straight to orjson instead
+# of through FastAPI's recursive jsonable_encoder. Headers set on the injected
+# response (e.g. X-Next-Cursor) are carried over.
+def orjson_response(content, response=None):
+    headers = None
+    if response is not None:
+        headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return ORJSONResponse(content, headers=headers)
+
+RESIDENT_PROJECTION = projection_for(Resident)
+COMMON_AREA_PROJECTION = projection_for(CommonArea)
+RESERVATION_PROJECTION = projection_for(Reservation)
+PAYMENT_CONCEPT_PROJECTION = projection_for(PaymentConcept)
+PAYMENT_PROJECTION = projection_for(Payment)
+VOTING_PROJECTION = projection_for(Voting)
+INCIDENT_PROJECTION = projection_for(Incident)
+
+# Helper function to resolve foreign ids with one $in query instead of one find_one per id.
+# Returns the documents keyed by their "id".
+async def load_by_ids(collection, ids, projection=None):
+    unique_ids = list(dict.fromkeys(i for i in ids if i))
+    if not unique_ids:
+        return {}
+    docs = await collection.find({"id": {"$in": unique_ids}}, projection or {"_id": 0}).to_list(len(unique_ids))
+    return {doc["id"]: doc for doc in docs}
+
+# In-process TTL/LRU cache. Concurrent misses on the same key share a single
+# loader call (single-flight); None results are not cached.
+class TTLCache:
+    def __init__(self, ttl_seconds: float, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generation = 0
+
+    async def get_or_load(self, key, loader):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._load(key, loader))
+            self._inflight[key] = future
+        return await asyncio.shield(future)
+
+    async def _load(self, key, loader):
+        generation = self._generation
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        # Skip storing results that were loaded before an invalidation
+        if value is not None and generation == self._generation:
+            self._entries[key] = (monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, key=None):
+        self._generation += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+# Request context: demo building and current resident, served from memory on the
+# hot path. Cached documents are shared between requests and must not be mutated.
+context_cache = TTLCache(ttl_seconds=float(os.environ.get("CONTEXT_CACHE_TTL_SECONDS", "60")))
+
+async def get_demo_building():
+    building = await context_cache.get_or_load(
+        "demo_building",
+        lambda: db.buildings.find_one({"is_demo": True}, {"_id": 0})
+    )
+    if not building:
+        forget_demo_seed()
+        raise HTTPException(status_code=404, detail="Demo building not found")
+    return building
+
+async def get_demo_context():
+    building = await get_demo_building()
+    resident = await context_cache.get_or_load(
+        ("resident", building["id"]),
+        lambda: db.residents.find_one({"building_id": building["id"]}, RESIDENT_PROJECTION)
+    )
+    if not resident:
+        raise HTTPException(status_code=404, detail="Demo resident not found")
+    return building, resident
+
+# Must be called after any write to buildings or residents
+def invalidate_demo_context():
+    context_cache.invalidate()
+
+# Reservation slots
+# Every active reservation claims one document per SLOT_MINUTES slot in
+# reservation_slots. The unique (common_area_id, date, slot) index makes the
+# overlap check an index lookup that is also correct under concurrent bookings.
+SLOT_MINUTES = 30
+ACTIVE_RESERVATION_STATUSES = ["CONFIRMADA", "PENDIENTE"]
+
+# Helper function to convert "HH:MM" into minutes since midnight
+def parse_hhmm(value):
+    try:
+        hours, minutes = value.split(":")
+        total = int(hours) * 60 + int(minutes)
+    except (AttributeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Hora inválida: {value}")
+    if not 0 <= total <= 24 * 60:
+        raise HTTPException(status_code=400, detail=f"Hora inválida: {value}")
+    return total
+
+# Helper function to list the slot keys ("HH:MM") covered by a time range
+def reservation_slot_keys(start_time, end_time):
+    start = parse_hhmm(start_time)
+    end = parse_hhmm(end_time)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="La hora de fin debe ser posterior a la de inicio")
+    if start % SLOT_MINUTES or end % SLOT_MINUTES:
+        raise HTTPException(status_code=400, detail=f"Las reservas deben ser en bloques de {SLOT_MINUTES} minutos")
+    return [f"{minute // 60:02d}:{minute % 60:02d}" for minute in range(start, end, SLOT_MINUTES)]
+
+def reservation_slot_documents(reservation):
+    return [
+        {
+            "common_area_id": reservation["common_area_id"],
+            "date": to_mongo_date(reservation["date"]),
+            "slot": slot,
+            "reservation_id": reservation["id"]
+        }
+        for slot in reservation_slot_keys(reservation["start_time"], reservation["end_time"])
+    ]
+
+async def claim_reservation_slots(reservation):
+    # Slots are claimed in ascending order and stop at the first taken one, so two
+    # overlapping bookings can never both succeed
+    try:
+        await db.reservation_slots.insert_many(reservation_slot_documents(reservation), ordered=True)
+    except BulkWriteError:
+        await release_reservation_slots(reservation["id"])
+        raise HTTPException(status_code=409, detail="El área ya está reservada en ese horario")
+
+async def release_reservation_slots(reservation_id):
+    await db.reservation_slots.delete_many({"reservation_id": reservation_id})
+
+# Claims slots for active reservations created before reservation_slots existed.
+# Overlapping legacy reservations keep whichever slot was claimed first. Legacy
+# times were never validated ("27:00", "19:15"); those reservations get no
+# slots and are logged, since this runs at startup and must not fail on them.
+async def backfill_reservation_slots(database):
+    if await database.reservation_slots.estimated_document_count() > 0:
+        return
+    cursor = database.reservations.find({"status": {"$in": ACTIVE_RESERVATION_STATUSES}}, {"_id": 0})
+    batch = []
+    async for reservation in cursor:
+        try:
+            batch.extend(reservation_slot_documents(reservation))
+        except HTTPException as e:
+            logger.warning("Reservation %s has no slots (%s-%s): %s", reservation.get("id"),
+                           reservation.get("start_time"), reservation.get("end_time"), e.detail)
+            continue
+        if len(batch) >= 1000:
+            await _insert_ignoring_duplicates(database.reservation_slots, batch)
+            batch = []
+    if batch:
+        await _insert_ignoring_duplicates(database.reservation_slots, batch)
+
+async def _insert_ignoring_duplicates(collection, documents):
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+async def get_common_area(area_id):
+    area = await context_cache.get_or_load(
+        ("common_area", area_id),
+        lambda: db.common_areas.find_one({"id": area_id}, COMMON_AREA_PROJECTION)
+    )
+    if not area or not area.get("is_active", True):
+        raise HTTPException(status_code=404, detail="Área común no encontrada")
+    return area
+
+# Availability
+# Bitmap of taken slots per (area, date), bit i set when slot i of the day is
+# claimed. Built from reservation_slots with one query per request and updated
+# in place on create/cancel; entries expire so other workers' bookings show up.
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+MAX_AVAILABILITY_DAYS = 31
+
+class AvailabilityIndex:
+    def __init__(self, ttl_seconds: float, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._bitmaps = OrderedDict()
+
+    def get(self, area_id, date):
+        entry = self._bitmaps.get((area_id, date))
+        if entry is None or entry[0] <= monotonic():
+            return None
+        return entry[1]
+
+    def put(self, area_id, date, bitmap):
+        self._bitmaps[(area_id, date)] = (monotonic() + self.ttl_seconds, bitmap)
+        self._bitmaps.move_to_end((area_id, date))
+        while len(self._bitmaps) > self.max_entries:
+            self._bitmaps.popitem(last=False)
+
+    # Applies a create (taken=True) or cancel (taken=False) to a cached bitmap
+    def mark(self, area_id, date, slots, taken):
+        entry = self._bitmaps.get((area_id, date))
+        if entry is None:
+            return
+        mask = 0
+        for slot in slots:
+            mask |= 1 << (parse_hhmm(slot) // SLOT_MINUTES)
+        bitmap = entry[1] | mask if taken else entry[1] & ~mask
+        self._bitmaps[(area_id, date)] = (entry[0], bitmap)
+
+    def discard(self, area_id, date):
+        self._bitmaps.pop((area_id, date), None)
+    
+    def invalidate(self):
+        self._bitmaps.clear()
+
+availability_index = AvailabilityIndex(ttl_seconds=float(os.environ.get("AVAILABILITY_TTL_SECONDS", "30")))
+
+async def load_availability(area_id, dates):
+    bitmaps = {}
+    missing = []
+    for date in dates:
+        bitmap = availability_index.get(area_id, date)
+        if bitmap is None:
+            missing.append(date)
+        else:
+            bitmaps[date] = bitmap
+    if missing:
+        loaded = dict.fromkeys(missing, 0)
+        cursor = db.reservation_slots.find(
+            {"common_area_id": area_id, "date": {"$in": [to_mongo_date(date) for date in missing]}},
+            {"_id": 0, "date": 1, "slot": 1}
+        )
+        async for slot in cursor:
+            loaded[from_mongo_date(slot["date"])] |= 1 << (parse_hhmm(slot["slot"]) // SLOT_MINUTES)
+        for date, bitmap in loaded.items():
+            availability_index.put(area_id, date, bitmap)
+        bitmaps.update(loaded)
+    return bitmaps
+
+# Helper function to turn a taken-slots bitmap into free intervals within opening hours
+def free_intervals(bitmap, opening_time, closing_time):
+    first = -(-parse_hhmm(opening_time) // SLOT_MINUTES)
+    last = parse_hhmm(closing_time) // SLOT_MINUTES
+    intervals = []
+    start = None
+    for index in range(first, last + 1):
+        free = index < last and not bitmap >> index & 1
+        if free and start is None:
+            start = index
+        elif not free and start is not None:
+            intervals.append({
+                "start_time": f"{start * SLOT_MINUTES // 60:02d}:{start * SLOT_MINUTES % 60:02d}",
+                "end_time": f"{index * SLOT_MINUTES // 60:02d}:{index * SLOT_MINUTES % 60:02d}"
+            })
+            start = None
+    return intervals
+
+# Change versions
+# collection_versions keeps one counter per collection and building, bumped by
+# every write that changes what the list routes return. The routes turn it into
+# an ETag, so revalidating unchanged data costs one find_one by _id and a 304
+# instead of the documents query. The epoch is set when the counter is created,
+# so a recreated counter never repeats an old ETag.
+async def bump_collection_version(database, collection, building_id):
+    await database.collection_versions.update_one(
+        {"_id": f"{collection}:{building_id}"},
+        {
+            "$inc": {"version": 1},
+            "$set": {"updated_at": datetime.now(timezone.utc)},
+            "$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}
+        },
+        upsert=True
+    )
+
+async def collection_etag(collection, building_id, *scope):
+    # scope holds whatever else selects the response (resident, page, cursor)
+    state = await db.collection_versions.find_one(
+        {"_id": f"{collection}:{building_id}"}, {"_id": 0, "version": 1, "epoch": 1}
+    ) or {}
+    digest = hashlib.sha1(json_util.dumps([collection, building_id, *scope]).encode()).hexdigest()[:12]
+    return f'W/"{state.get("epoch", "0")}.{state.get("version", 0)}.{digest}"'
+
+# ETag of a view built from several collections, read in one query
+async def combined_etag(collections, building_id, *scope):
+    ids = [f"{collection}:{building_id}" for collection in collections]
+    states = {
+        state["_id"]: state
+        async for state in db.collection_versions.find({"_id": {"$in": ids}}, {"version": 1, "epoch": 1})
+    }
+    versions = [[states.get(key, {}).get("epoch", "0"), states.get(key, {}).get("version", 0)] for key in ids]
+    digest = hashlib.sha1(json_util.dumps([ids, versions, *scope]).encode()).hexdigest()[:16]
+    return f'W/"{digest}"'
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+# Returns the 304 response when the client's copy is current, otherwise tags
+# the response that is about to be built
+def conditional_response(response, etag, if_none_match):
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+# Write routes accept include=a,b to return refreshed views along with the
+# write, so the client does not issue a second request to reload them
+def parse_include(include, allowed):
+    requested = {part.strip() for part in (include or "").split(",") if part.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Valores de include no válidos: {', '.join(sorted(unknown))}")
+    return requested
+
+# List routes accept fields=a,b (sparse fieldsets) and only return those
+# fields. The Mongo projection is narrowed to them plus whatever the route
+# still needs internally (sort keys for the cursor, join keys), and those
+# extras are trimmed before the response is written. Virtual fields are added
+# by the route itself (e.g. a payment's concept) and never projected.
+def sparse_projection(fields, projection, needed=(), virtual=()):
+    if fields is None:
+        return projection, None
+    requested = {part.strip() for part in fields.split(",") if part.strip()}
+    if not requested:
+        raise HTTPException(status_code=400, detail="fields no puede estar vacío")
+    unknown = requested - (set(projection) - {"_id"}) - set(virtual)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Campos no válidos: {', '.join(sorted(unknown))}")
+    narrowed = {"_id": 0, **{field: 1 for field in sorted(requested | set(needed)) if field in projection}}
+    return narrowed, requested
+
+def trim_fields(docs, requested):
+    if requested is not None:
+        for doc in docs:
+            for key in doc.keys() - requested:
+                del doc[key]
+    return docs
+
+# Keyset pagination
+# List routes sort on an indexed key ending in "id" and hand out an opaque
+# cursor with the sort values of the last document returned. The next page
+# resumes from there with an index seek instead of skipping documents.
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(doc, sort):
+    values = [doc[field] for field, _ in sort]
+    return base64.urlsafe_b64encode(json_util.dumps(values).encode()).decode()
+
+def decode_cursor(after, sort):
+    try:
+        values = json_util.loads(base64.urlsafe_b64decode(after.encode()))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    return values
+
+# Helper function to build the "after this row" filter for a compound sort
+def keyset_filter(sort, values):
+    clauses = []
+    for index, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[prev] for prev, (prev_field, _) in enumerate(sort[:index])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[index]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+async def paginate(collection, query, sort, response, limit=DEFAULT_PAGE_SIZE, after=None, projection=None):
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit debe estar entre 1 y {MAX_PAGE_SIZE}")
+    if after:
+        query = {"$and": [query, keyset_filter(sort, decode_cursor(after, sort))]}
+    docs = await collection.find(query, projection).sort(sort).limit(limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(docs[-1], sort)
+    return docs
+
+# Vote tallies
+# One vote_tallies document per voting holding a counter per option index
+# ({"counts": {"0": 12, "2": 3}, "total": 15}), bumped with $inc on every vote
+# so results are read in O(options) instead of scanning votes.
+async def increment_vote_tally(voting_id, option_index):
+    return await db.vote_tallies.find_one_and_update(
+        {"voting_id": voting_id},
+        {"$inc": {f"counts.{option_index}": 1, "total": 1}},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+
+def format_vote_results(voting, tally):
+    counts = (tally or {}).get("counts", {})
+    total = (tally or {}).get("total", 0)
+    return {
+        "voting_id": voting["id"],
+        "title": voting["title"],
+        "status": voting["status"],
+        "total_votes": total,
+        "results": [
+            {
+                "option": option,
+                "votes": counts.get(str(index), 0),
+                "percentage": round(counts.get(str(index), 0) * 100 / total, 2) if total else 0
+            }
+            for index, option in enumerate(voting["options"])
+        ]
+    }
+
+# Rebuilds tallies from the votes collection and reports the votings whose
+# stored counters had drifted
+async def reconcile_vote_tallies(database, voting_id=None):
+    match = {"voting_id": voting_id} if voting_id else {}
+    grouped = await database.votes.aggregate([
+        {"$match": match},
+        {"$group": {"_id": {"voting_id": "$voting_id", "option": "$option"}, "count": {"$sum": 1}}}
+    ]).to_list(None)
+    stored = {tally["voting_id"]: tally async for tally in database.vote_tallies.find(match, {"_id": 0})}
+    
+    voting_ids = {group["_id"]["voting_id"] for group in grouped} | set(stored)
+    votings = await load_by_ids(database.votings, voting_ids)
+    expected = {vid: {"counts": {}, "total": 0} for vid in voting_ids}
+    for group in grouped:
+        voting = votings.get(group["_id"]["voting_id"])
+        if not voting or group["_id"]["option"] not in voting["options"]:
+            continue
+        tally = expected[voting["id"]]
+        key = str(voting["options"].index(group["_id"]["option"]))
+        tally["counts"][key] = tally["counts"].get(key, 0) + group["count"]
+        tally["total"] += group["count"]
+    
+    drift = []
+    for vid, tally in expected.items():
+        current = stored.get(vid, {})
+        if current.get("counts", {}) == tally["counts"] and current.get("total", 0) == tally["total"]:
+            continue
+        drift.append({"voting_id": vid, "stored": {"counts": current.get("counts", {}), "total": current.get("total", 0)},
+                      "expected": tally})
+        await database.vote_tallies.replace_one({"voting_id": vid}, {"voting_id": vid, **tally}, upsert=True)
+    if drift:
+        logger.warning("Vote tallies drifted for %d voting(s), rebuilt", len(drift))
+    return {"checked": len(expected), "drift": drift}
+
+# Index management
+# Compound indexes declared per collection. Every filter/sort issued by the
+# route handlers below must be covered by one of these, see ROUTE_QUERIES.
+INDEX_SPECS = {
+    "buildings": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("is_demo", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "residents": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("building_id", ASCENDING)]),
+    ],
+    "properties": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("building_id", ASCENDING)]),
+    ],
+    "common_areas": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("building_id", ASCENDING), ("is_active", ASCENDING)]),
+    ],
+    "payment_concepts": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("building_id", ASCENDING)]),
+    ],
+    "payments": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("resident_id", ASCENDING), ("status", ASCENDING)]),
+        IndexModel([("resident_id", ASCENDING), ("due_date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("building_id", ASCENDING), ("status", ASCENDING), ("due_date", ASCENDING)]),
+        # Idempotency key of payments generated by billing runs
+        IndexModel([("billing_key", ASCENDING)], unique=True, sparse=True),
+    ],
+    "reservations": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("common_area_id", ASCENDING), ("date", ASCENDING), ("start_time", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("resident_id", ASCENDING), ("status", ASCENDING), ("date", ASCENDING)]),
+    ],
+    "votings": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("building_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "reservation_slots": [
+        IndexModel([("common_area_id", ASCENDING), ("date", ASCENDING), ("slot", ASCENDING)], unique=True),
+        IndexModel([("reservation_id", ASCENDING)]),
+    ],
+    "votes": [
+        # Enforces one vote per resident per voting
+        IndexModel([("voting_id", ASCENDING), ("resident_id", ASCENDING)], unique=True),
+    ],
+    "vote_tallies": [
+        IndexModel([("voting_id", ASCENDING)], unique=True),
+    ],
+    "incidents": [
+        IndexModel([("id", ASCENDING)], unique=True),
+        IndexModel([("reported_by", ASCENDING), ("building_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("building_id", ASCENDING)]),
+    ],
+    "collection_versions": [
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+}
+
+# Representative shape of every query issued by the route handlers. The values
+# are placeholders, only the filter/sort shape matters to the query planner.
+ROUTE_QUERIES = [
+    {"route": "GET /api/resident/dashboard", "collection": "buildings", "filter": {"is_demo": True}},
+    {"route": "GET /api/resident/dashboard", "collection": "residents", "filter": {"building_id": ""}},
+    {"route": "GET /api/resident/dashboard", "collection": "payments",
+     "filter": {"resident_id": "", "status": {"$in": ["PENDIENTE", "VENCIDO"]}}},
+    {"route": "GET /api/resident/dashboard", "collection": "reservations",
+     "filter": {"resident_id": "", "date": {"$gte": ""}, "status": "CONFIRMADA"}},
+    {"route": "GET /api/resident/dashboard", "collection": "votings", "filter": {"building_id": "", "status": "ACTIVA"}},
+    {"route": "GET /api/resident/dashboard", "collection": "incidents",
+     "filter": {"reported_by": "", "building_id": ""}, "sort": {"created_at": -1}},
+    {"route": "GET /api/common-areas", "collection": "common_areas", "filter": {"building_id": "", "is_active": True}},
+    {"route": "GET /api/reservations/{area_id}", "collection": "reservations",
+     "filter": {"common_area_id": "", "date": {"$gte": ""}, "status": {"$in": ["CONFIRMADA", "PENDIENTE"]}},
+     "sort": {"date": 1, "start_time": 1, "id": 1}},
+    {"route": "POST /api/reservations", "collection": "common_areas", "filter": {"id": ""}},
+    {"route": "GET /api/common-areas/{area_id}/availability", "collection": "reservation_slots",
+     "filter": {"common_area_id": "", "date": {"$in": [""]}}},
+    {"route": "POST /api/reservations/{reservation_id}/cancel", "collection": "reservations",
+     "filter": {"id": "", "resident_id": "", "status": {"$in": ["CONFIRMADA", "PENDIENTE"]}}},
+    {"route": "POST /api/reservations", "collection": "reservation_slots", "filter": {"reservation_id": ""}},
+    {"route": "GET /api/payments", "collection": "payments", "filter": {"resident_id": ""},
+     "sort": {"due_date": -1, "id": -1}},
+    {"route": "GET /api/payments", "collection": "payment_concepts", "filter": {"id": {"$in": [""]}}},
+    {"route": "GET /api/votings", "collection": "votings", "filter": {"building_id": "", "status": "ACTIVA"},
+     "sort": {"created_at": -1, "id": -1}},
+    {"route": "POST /api/vote", "collection": "votings", "filter": {"id": ""}},
+    {"route": "POST /api/vote", "collection": "vote_tallies", "filter": {"voting_id": ""}},
+    {"route": "GET /api/votings/{voting_id}/results", "collection": "vote_tallies", "filter": {"voting_id": ""}},
+    {"route": "GET /api/incidents", "collection": "incidents",
+     "filter": {"reported_by": "", "building_id": ""}, "sort": {"created_at": -1, "id": -1}},
+    {"route": "GET /api/admin/export/{collection}", "collection": "payments", "filter": {"building_id": ""}},
+    {"route": "POST /api/payments/{payment_id}/pay", "collection": "payments", "filter": {"id": "", "resident_id": ""}},
+    {"route": "POST /api/admin/billing-runs", "collection": "payment_concepts", "filter": {"building_id": "", "is_mandatory": True}},
+    {"route": "POST /api/admin/billing-runs", "collection": "residents", "filter": {"building_id": ""}},
+    {"route": "overdue_sweeper", "collection": "payments",
+     "filter": {"building_id": "", "status": "PENDIENTE", "due_date": {"$lt": ""}}},
+]
+
+# Keeps the first vote of each resident per voting, votes cast twice before the
+# unique index existed are deleted and the affected tallies rebuilt
+async def remove_duplicate_votes(database):
+    duplicates = await database.votes.aggregate([
+        {"$sort": {"created_at": 1}},
+        {"$group": {"_id": {"voting_id": "$voting_id", "resident_id": "$resident_id"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True).to_list(None)
+    for group in duplicates:
+        await database.votes.delete_many({"_id": {"$in": group["ids"][1:]}})
+    for voting_id in {group["_id"]["voting_id"] for group in duplicates}:
+        await reconcile_vote_tallies(database, voting_id)
+    logger.warning("Removed duplicate votes for %d resident/voting pair(s)", len(duplicates))
+
+DUPLICATE_RESOLVERS = {
+    "votes": remove_duplicate_votes,
+}
+
+# Error codes returned when an index with the same name/keys exists with other options
+INDEX_CONFLICT_CODES = (85, 86)
+
+async def ensure_indexes(database):
+    # create_index is a no-op when an identical index already exists, so this is
+    # safe to run on every startup. Indexes whose options changed are rebuilt.
+    for collection_name, models in INDEX_SPECS.items():
+        collection = database[collection_name]
+        for model in models:
+            spec = dict(model.document)
+            keys = list(spec.pop("key").items())
+            try:
+                await collection.create_index(keys, **spec)
+            except DuplicateKeyError:
+                # Existing data violates a new unique index, clean it up and retry
+                if collection_name not in DUPLICATE_RESOLVERS:
+                    raise
+                logger.warning("Resolving duplicates in %s before building %s", collection_name, spec["name"])
+                await DUPLICATE_RESOLVERS[collection_name](database)
+                await collection.create_index(keys, **spec)
+            except OperationFailure as e:
+                if e.code not in INDEX_CONFLICT_CODES:
+                    raise
+                logger.warning("Rebuilding index %s.%s: %s", collection_name, spec["name"], e)
+                await collection.drop_index(spec["name"])
+                try:
+                    await collection.create_index(keys, **spec)
+                except DuplicateKeyError:
+                    if collection_name not in DUPLICATE_RESOLVERS:
+                        raise
+                    await DUPLICATE_RESOLVERS[collection_name](database)
+                    await collection.create_index(keys, **spec)
+
+# Helper function to collect every stage name of an explain() plan tree
+def _plan_stages(plan):
+    if not isinstance(plan, dict):
+        return []
+    stages = [plan["stage"]] if "stage" in plan else []
+    for key in ("inputStage", "queryPlan", "winningPlan"):
+        stages.extend(_plan_stages(plan.get(key)))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def audit_query_plans(database):
+    # Explain every registered route query and collect those that would scan the
+    # whole collection instead of using one of the indexes in INDEX_SPECS
+    offenders = []
+    for query in ROUTE_QUERIES:
+        find = {"find": query["collection"], "filter": query["filter"]}
+        if query.get("sort"):
+            find["sort"] = query["sort"]
+        explain = await database.command({"explain": find, "verbosity": "queryPlanner"})
+        stages = _plan_stages(explain.get("queryPlanner", {}).get("winningPlan"))
+        if "COLLSCAN" in stages:
+            offenders.append(f"{query['route']} -> {query['collection']} {query['filter']}")
+    if offenders:
+        raise RuntimeError("Route queries falling back to COLLSCAN:\n" + "\n".join(offenders))
+
+# Financial summaries
+# One financial_summaries document per building (_id = building_id) holding
+# count/amount cells keyed "<concept_id>|<YYYY-MM>|<status>", where the month
+# comes from due_date. Payment writes apply $inc deltas to the affected cells,
+# so reading a building's totals is a single document fetch. The $merge
+# aggregation in rebuild_financial_summaries() recomputes them from payments.
+SUMMARY_STATUS_LABELS = {
+    PaymentStatus.PAGADO: "collected",
+    PaymentStatus.PENDIENTE: "pending",
+    PaymentStatus.VENCIDO: "overdue",
+}
+
+def summary_cell(concept_id, due_date, status):
+    month = due_date.strftime("%Y-%m") if isinstance(due_date, datetime) else str(due_date)[:7]
+    return f"{concept_id}|{month}|{PaymentStatus(status).value}"
+
+# Builds {cell: [count, amount]} deltas from (payment, old_status, new_status)
+# changes; old_status is None for new payments
+def summary_deltas(changes):
+    deltas = {}
+    for payment, old_status, new_status in changes:
+        for status, sign in ((old_status, -1), (new_status, 1)):
+            if status is None:
+                continue
+            delta = deltas.setdefault(summary_cell(payment["concept_id"], payment["due_date"], status), [0, 0])
+            delta[0] += sign
+            delta[1] += sign * payment["amount"]
+    return deltas
+
+async def apply_summary_deltas(database, building_id, deltas):
+    increments = {}
+    for cell, (count, amount) in deltas.items():
+        if count or amount:
+            increments[f"cells.{cell}.count"] = count
+            increments[f"cells.{cell}.amount"] = amount
+    if not increments:
+        return
+    await database.financial_summaries.update_one(
+        {"_id": building_id},
+        {"$inc": increments, "$set": {"building_id": building_id, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+def financial_summary_pipeline(building_id=None):
+    return [
+        {"$match": {"building_id": building_id} if building_id else {}},
+        {"$group": {
+            "_id": {
+                "building_id": "$building_id",
+                "cell": {"$concat": [
+                    "$concept_id", "|", {"$dateToString": {"format": "%Y-%m", "date": "$due_date"}}, "|", "$status"
+                ]}
+            },
+            "count": {"$sum": 1},
+            "amount": {"$sum": "$amount"}
+        }},
+        {"$group": {
+            "_id": "$_id.building_id",
+            "cells": {"$push": {"k": "$_id.cell", "v": {"count": "$count", "amount": "$amount"}}}
+        }},
+        {"$project": {"_id": 1, "building_id": "$_id", "cells": {"$arrayToObject": "$cells"}}},
+    ]
+
+async def rebuild_financial_summaries(database, building_id=None):
+    pipeline = financial_summary_pipeline(building_id) + [
+        {"$set": {"updated_at": "$$NOW"}},
+        {"$merge": {"into": "financial_summaries", "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}}
+    ]
+    if building_id:
+        await database.financial_summaries.delete_one({"_id": building_id})
+    await database.payments.aggregate(pipeline, allowDiskUse=True).to_list(None)
+
+# Helper function to fold summary cells into totals per status, concept and month
+def format_financial_summary(building_id, summary, concepts):
+    def empty():
+        return {label: {"count": 0, "amount": 0.0} for label in SUMMARY_STATUS_LABELS.values()}
+    
+    totals = empty()
+    by_concept = {}
+    by_month = {}
+    for cell, values in (summary or {}).get("cells", {}).items():
+        concept_id, month, status = cell.split("|")
+        label = SUMMARY_STATUS_LABELS.get(status)
+        if not label or not values.get("count"):
+            continue
+        for bucket in (totals, by_concept.setdefault(concept_id, empty()), by_month.setdefault(month, empty())):
+            bucket[label]["count"] += values["count"]
+            bucket[label]["amount"] = round(bucket[label]["amount"] + values["amount"], 2)
+    return {
+        "building_id": building_id,
+        "updated_at": (summary or {}).get("updated_at"),
+        "totals": totals,
+        "by_concept": [
+            {"concept_id": concept_id, "name": concepts.get(concept_id, {}).get("name"), **values}
+            for concept_id, values in by_concept.items()
+        ],
+        "by_month": [{"month": month, **values} for month, values in sorted(by_month.items())]
+    }
+
+# Cross-worker locks
+# With several uvicorn workers every process runs the lifespan. A lock is one
+# init_locks document whose _id is the lock name: acquiring upserts it only when
+# the previous lease has expired, so a concurrent attempt hits the _id unique
+# key and fails. The holder renews the lease while it works, and a crashed
+# holder's lease simply runs out.
+LOCK_TTL_SECONDS = int(os.environ.get("LOCK_TTL_SECONDS", "30"))
+LOCK_POLL_SECONDS = 0.2
+
+def lock_owner():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+async def acquire_lock(database, name, owner, ttl_seconds=LOCK_TTL_SECONDS):
+    now = datetime.now(timezone.utc)
+    try:
+        await database.init_locks.update_one(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def release_lock(database, name, owner):
+    await database.init_locks.delete_one({"_id": name, "owner": owner})
+
+@asynccontextmanager
+async def hold_lock(database, name, wait=True, ttl_seconds=LOCK_TTL_SECONDS):
+    # Yields True once the lock is held; with wait=False yields False right away
+    # when another worker holds it
+    owner = lock_owner()
+    while not await acquire_lock(database, name, owner, ttl_seconds):
+        if not wait:
+            yield False
+            return
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+    
+    async def renew():
+        while True:
+            await asyncio.sleep(ttl_seconds / 3)
+            await acquire_lock(database, name, owner, ttl_seconds)
+    
+    renewal = asyncio.create_task(renew())
+    try:
+        yield True
+    finally:
+        renewal.cancel()
+        with suppress(asyncio.CancelledError):
+            await renewal
+        await release_lock(database, name, owner)
+
+def run_exclusive(database, name, job):
+    # Wraps a periodic job so only one worker runs it at a time
+    async def exclusive():
+        async with hold_lock(database, f"job:{name}", wait=False) as held:
+            if not held:
+                return {"skipped": "running in another worker"}
+            return await job()
+    return exclusive
+
+# Background jobs
+# Each job runs in a loop owned by the app lifespan; job_metrics keeps the
+# outcome of the last run of every job for /api/admin/jobs.
+job_metrics = {}
+
+async def run_periodically(name, interval_seconds, job):
+    metrics = job_metrics.setdefault(name, {
+        "interval_seconds": interval_seconds, "runs": 0, "failures": 0,
+        "last_run_at": None, "last_duration_ms": None, "last_result": None, "last_error": None
+    })
+    while True:
+        started = perf_counter()
+        try:
+            metrics["last_result"] = await job()
+            metrics["last_error"] = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            metrics["failures"] += 1
+            metrics["last_error"] = str(e)
+            logger.exception("Background job %s failed", name)
+        metrics["runs"] += 1
+        metrics["last_run_at"] = datetime.now(timezone.utc)
+        metrics["last_duration_ms"] = round((perf_counter() - started) * 1000, 2)
+        await asyncio.sleep(interval_seconds)
+
+# Overdue payment sweeper
+# Moves PENDIENTE payments whose due_date has passed to VENCIDO with one
+# update_many per building over the (building_id, status, due_date) index.
+# The job_state watermark records the last day swept, so runs within the
+# same day (or from other workers) are a single find_one.
+OVERDUE_SWEEP_INTERVAL_SECONDS = float(os.environ.get("OVERDUE_SWEEP_INTERVAL_SECONDS", "3600"))
+
+async def sweep_overdue_payments(database, today=None):
+    today = today or today_utc()
+    if await database.job_state.find_one({"_id": "overdue_sweeper", "watermark": {"$gte": today}}):
+        return {"skipped": True, "watermark": today}
+    
+    started = perf_counter()
+    modified = {}
+    for building_id in await database.buildings.distinct("id"):
+        overdue_filter = {"building_id": building_id, "status": PaymentStatus.PENDIENTE, "due_date": {"$lt": today}}
+        # Totals of what is about to move, for the financial summary
+        groups = await database.payments.aggregate([
+            {"$match": overdue_filter},
+            {"$group": {
+                "_id": {"concept_id": "$concept_id", "due_date": {"$dateToString": {"format": "%Y-%m", "date": "$due_date"}}},
+                "count": {"$sum": 1},
+                "amount": {"$sum": "$amount"}
+            }}
+        ]).to_list(None)
+        if not groups:
+            continue
+        result = await database.payments.update_many(overdue_filter, {"$set": {"status": PaymentStatus.VENCIDO.value}})
+        if not result.modified_count:
+            continue
+        modified[building_id] = result.modified_count
+        await bump_collection_version(database, "payments", building_id)
+        
+        if result.modified_count == sum(group["count"] for group in groups):
+            deltas = {}
+            for group in groups:
+                for status, sign in ((PaymentStatus.PENDIENTE, -1), (PaymentStatus.VENCIDO, 1)):
+                    deltas[summary_cell(group["_id"]["concept_id"], group["_id"]["due_date"], status)] = [
+                        sign * group["count"], sign * group["amount"]
+                    ]
+            await apply_summary_deltas(database, building_id, deltas)
+        else:
+            # Payments changed between the aggregation and the update
+            await rebuild_financial_summaries(database, building_id)
+    
+    run = {
+        "skipped": False,
+        "watermark": today,
+        "buildings": len(modified),
+        "modified": sum(modified.values()),
+        "duration_ms": round((perf_counter() - started) * 1000, 2)
+    }
+    await database.job_state.update_one({"_id": "overdue_sweeper"}, {"$set": run}, upsert=True)
+    if run["modified"]:
+        logger.info("Marked %d payment(s) as overdue in %d building(s)", run["modified"], run["buildings"])
+    return run
+
+# Billing runs
+# Generates a period's payments for every resident of a building from its
+# mandatory payment concepts. Each generated payment carries a unique
+# billing_key (resident:concept:period), so rerunning a period only inserts
+# what is missing. Variable concepts are billed at base_amount as an estimate.
+BILLING_BATCH_SIZE = 1000
+BILLING_DUE_DAY = int(os.environ.get("BILLING_DUE_DAY", "15"))
+
+def parse_period(period):
+    try:
+        return datetime.strptime(period, "%Y-%m").replace(tzinfo=timezone.utc)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="El periodo debe tener el formato YYYY-MM")
+
+# ANUAL concepts are billed in January, MENSUAL ones every period
+def concept_applies(concept, period_start):
+    return concept["frequency"] != "ANUAL" or period_start.month == 1
+
+async def _insert_billing_batch(database, batch):
+    failed = set()
+    try:
+        await database.payments.insert_many(batch, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details["writeErrors"]
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        failed = {error["index"] for error in errors}
+    inserted = [payment for index, payment in enumerate(batch) if index not in failed]
+    if inserted:
+        await apply_summary_deltas(database, inserted[0]["building_id"],
+                                   summary_deltas((payment, None, payment["status"]) for payment in inserted))
+    return len(inserted), len(failed)
+
+async def run_billing(database, building_id, period, batch_size=BILLING_BATCH_SIZE):
+    period_start = parse_period(period)
+    due_date = period_start.replace(day=min(BILLING_DUE_DAY, 28)).strftime("%Y-%m-%d")
+    concepts = [
+        concept async for concept in database.payment_concepts.find(
+            {"building_id": building_id, "is_mandatory": True}, PAYMENT_CONCEPT_PROJECTION
+        )
+        if concept_applies(concept, period_start)
+    ]
+    
+    started = perf_counter()
+    residents = inserted = skipped = 0
+    batch = []
+    pending = None
+    # The next batch is built while the previous insert_many is in flight
+    async for resident in database.residents.find({"building_id": building_id}, {"_id": 0, "id": 1}).batch_size(batch_size):
+        residents += 1
+        for concept in concepts:
+            payment = prepare_for_mongo(Payment(
+                resident_id=resident["id"],
+                concept_id=concept["id"],
+                amount=concept["base_amount"],
+                due_date=due_date,
+                status=PaymentStatus.PENDIENTE,
+                building_id=building_id
+            ).dict())
+            payment["billing_key"] = f"{resident['id']}:{concept['id']}:{period}"
+            batch.append(payment)
+        if len(batch) >= batch_size:
+            if pending:
+                counts = await pending
+                inserted, skipped = inserted + counts[0], skipped + counts[1]
+            pending = asyncio.ensure_future(_insert_billing_batch(database, batch))
+            batch = []
+    if pending:
+        counts = await pending
+        inserted, skipped = inserted + counts[0], skipped + counts[1]
+    if batch:
+        counts = await _insert_billing_batch(database, batch)
+        inserted, skipped = inserted + counts[0], skipped + counts[1]
+    
+    if inserted:
+        await bump_collection_version(database, "payments", building_id)
+    
+    elapsed = perf_counter() - started
+    run = {
+        "building_id": building_id,
+        "period": period,
+        "residents": residents,
+        "concepts": len(concepts),
+        "inserted": inserted,
+        "skipped": skipped,
+        "duration_ms": round(elapsed * 1000, 2),
+        "payments_per_second": round((inserted + skipped) / elapsed) if elapsed else 0,
+        "created_at": datetime.now(timezone.utc)
+    }
+    await database.billing_runs.insert_one(dict(run))
+    logger.info("Billing run %s for building %s: %d inserted, %d already billed", period, building_id, inserted, skipped)
+    return run
+
+# Live events
+# Every bump of collection_versions becomes a {"collection", "version"} event
+# for the building's subscribers. One watcher per process follows a change
+# stream on collection_versions, or polls it by updated_at where change streams
+# are unavailable (standalone mongod). Each client has a small bounded queue:
+# a client that falls behind gets its queue replaced by one "resync" event
+# instead of holding memory, so a slow reader never blocks the fan-out.
+EVENT_SOURCE = os.environ.get("EVENT_SOURCE", "auto")  # auto, changestream or poll
+EVENT_QUEUE_SIZE = int(os.environ.get("EVENT_QUEUE_SIZE", "16"))
+EVENT_MAX_CLIENTS = int(os.environ.get("EVENT_MAX_CLIENTS", "10000"))
+EVENT_HEARTBEAT_SECONDS = float(os.environ.get("EVENT_HEARTBEAT_SECONDS", "25"))
+EVENT_POLL_SECONDS = float(os.environ.get("EVENT_POLL_SECONDS", "1"))
+# Polling re-reads this much before the watermark to absorb clock skew between
+# writers; versions already delivered are skipped
+EVENT_POLL_OVERLAP = timedelta(seconds=2)
+CHANGE_STREAM_UNSUPPORTED_CODES = (40573, 40324)
+
+class EventHub:
+    def __init__(self, queue_size=EVENT_QUEUE_SIZE, max_clients=EVENT_MAX_CLIENTS):
+        self.queue_size = queue_size
+        self.max_clients = max_clients
+        self.subscribers = {}
+        self.clients = 0
+    
+    def subscribe(self, building_id):
+        if self.clients >= self.max_clients:
+            raise HTTPException(status_code=503, detail="Demasiadas conexiones de eventos")
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers.setdefault(building_id, set()).add(queue)
+        self.clients += 1
+        return queue
+    
+    def unsubscribe(self, building_id, queue):
+        queues = self.subscribers.get(building_id, set())
+        if queue in queues:
+            queues.discard(queue)
+            self.clients -= 1
+        if not queues:
+            self.subscribers.pop(building_id, None)
+    
+    def publish(self, building_id, event):
+        for queue in self.subscribers.get(building_id, ()):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                event_overflows.inc()
+                self._resync(queue)
+    
+    def resync_all(self):
+        for queues in self.subscribers.values():
+            for queue in queues:
+                self._resync(queue)
+    
+    def _resync(self, queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({"type": "resync"})
+    
+    def publish_version(self, doc):
+        collection, _, building_id = doc["_id"].partition(":")
+        self.publish(building_id, {"type": "change", "collection": collection, "version": doc.get("version", 0)})
+
+event_hub = EventHub()
+
+async def watch_change_stream(database, hub):
+    pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace"]}}}]
+    resume_token = None
+    while True:
+        try:
+            async with database.collection_versions.watch(
+                pipeline, full_document="updateLookup", resume_after=resume_token
+            ) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    if change.get("fullDocument"):
+                        hub.publish_version(change["fullDocument"])
+        except PyMongoError as e:
+            if isinstance(e, OperationFailure) and e.code in CHANGE_STREAM_UNSUPPORTED_CODES:
+                raise
+            # Events missed while reconnecting are covered by a resync
+            logger.warning("Change stream on collection_versions failed, reopening: %s", e)
+            resume_token = None
+            hub.resync_all()
+            await asyncio.sleep(1)
+
+async def poll_collection_versions(database, hub, state):
+    # One polling pass; state carries the watermark and delivered versions
+    if not hub.clients:
+        state["watermark"] = datetime.now(timezone.utc)
+        return 0
+    query = {"updated_at": {"$gt": state["watermark"] - EVENT_POLL_OVERLAP}}
+    docs = await database.collection_versions.find(query).sort("updated_at", ASCENDING).to_list(1000)
+    published = 0
+    for doc in docs:
+        if doc.get("version", 0) > state["delivered"].get(doc["_id"], 0):
+            state["delivered"][doc["_id"]] = doc.get("version", 0)
+            hub.publish_version(doc)
+            published += 1
+        # Clients opened without tz_aware return naive UTC datetimes
+        updated_at = doc["updated_at"] if doc["updated_at"].tzinfo else doc["updated_at"].replace(tzinfo=timezone.utc)
+        state["watermark"] = max(state["watermark"], updated_at)
+    return published
+
+async def watch_collection_versions(database, hub):
+    if EVENT_SOURCE != "poll":
+        try:
+            await watch_change_stream(database, hub)
+        except OperationFailure as e:
+            if EVENT_SOURCE == "changestream":
+                raise
+            logger.info("Change streams unavailable (%s), polling collection_versions every %ss", e.code, EVENT_POLL_SECONDS)
+    # Versions are seeded so events only cover changes made from now on
+    state = {"watermark": datetime.now(timezone.utc), "delivered": {}}
+    async for doc in database.collection_versions.find({}, {"version": 1}):
+        state["delivered"][doc["_id"]] = doc.get("version", 0)
+    while True:
+        try:
+            await poll_collection_versions(database, hub, state)
+        except PyMongoError:
+            logger.exception("Polling collection_versions failed")
+        await asyncio.sleep(EVENT_POLL_SECONDS)
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {orjson.dumps(event).decode()}\n\n"
+
 # Demo data initialization
+# Demo documents get ids derived from a fixed namespace and are written with
+# $setOnInsert upserts, so a seed interrupted halfway (or run by two workers)
+# completes the same documents instead of creating a second demo building.
+# The init_state marker is written last and short-circuits later calls; bump
+# SEED_VERSION when the seed changes so every deployment runs it again and
+# creates the documents it is missing.
+SEED_VERSION = 1
+demo_seed_state = {}
+DEMO_NAMESPACE = uuid.UUID("6f1f3c1e-5d2a-4f0b-9a53-2b7c9e0d4a11")
+
+def demo_id(key):
+    return str(uuid.uuid5(DEMO_NAMESPACE, key))
+
+async def upsert_demo_documents(collection, documents):
+    # Returns the documents that did not exist yet
+    result = await collection.bulk_write(
+        [UpdateOne({"id": doc["id"]}, {"$setOnInsert": doc}, upsert=True) for doc in documents],
+        ordered=False
+    )
+    return [documents[index] for index in result.upserted_ids]
+
 async def init_demo_data():
-    # Check if demo data already exists
-    existing_building = await db.buildings.find_one({"is_demo": True})
-    if existing_building:
-        return  # Demo data already exists
-    
+    # The frontend calls /init-demo on every page load. Once this worker has
+    # seen a marker for the current SEED_VERSION it answers from memory; only
+    # the first call per worker (or a version change) reads the marker.
+    if demo_seed_state.get("version") == SEED_VERSION:
+        demo_init_requests.inc(("memory",))
+        return
+    demo_init_requests.inc(("database",))
+    if await demo_seed_current():
+        return
+    async with hold_lock(db, "demo_data"):
+        if await demo_seed_current():
+            return
+        # Demo data created before the marker existed is kept as it is
+        if not await db.buildings.find_one({"is_demo": True, "id": {"$ne": demo_id("building")}}, {"_id": 1}):
+            await seed_demo_data()
+            demo_init_seeds.inc()
+        await db.init_state.update_one(
+            {"_id": "demo_data"},
+            {"$set": {"version": SEED_VERSION, "completed_at": datetime.now(timezone.utc), "pid": os.getpid()}},
+            upsert=True
+        )
+    invalidate_demo_context()
+    demo_seed_state["version"] = SEED_VERSION
+
+async def demo_seed_current():
+    # The marker alone is not enough: if the demo building was deleted since,
+    # the seed has to run again
+    marker, building = await asyncio.gather(
+        db.init_state.find_one({"_id": "demo_data"}, {"_id": 0, "version": 1}),
+        db.buildings.find_one({"is_demo": True}, {"_id": 1})
+    )
+    if marker and marker.get("version") == SEED_VERSION and building:
+        demo_seed_state["version"] = SEED_VERSION
+        return True
+    return False
+
+# Forgets what this worker knows about the seed, e.g. when the demo building
+# turns out to be missing
+def forget_demo_seed():
+    demo_seed_state.clear()
+
+async def seed_demo_data():
     # Create demo building
     demo_building = Building(
+        id=demo_id("building"),
         name="Torre Moderna Demo",
         address="Av. Principal 123, Lima",
         total_units=20,
         is_demo=True
     )
-    await db.buildings.insert_one(prepare_for_mongo(demo_building.dict()))
+    await upsert_demo_documents(db.buildings, [prepare_for_mongo(demo_building.dict())])
     building_id = demo_building.id
     
     # Create demo users
     demo_users = [
-        User(username="residente_demo", email="residente@demo.com", role=UserRole.RESIDENTE, building_id=building_id),
-        User(username="admin_demo", email="admin@demo.com", role=UserRole.ADMINISTRADOR, building_id=building_id),
-        User(username="proveedor_demo", email="proveedor@demo.com", role=UserRole.PROVEEDOR, building_id=building_id)
+        User(id=demo_id("user:residente_demo"), username="residente_demo", email="residente@demo.com", role=UserRole.RESIDENTE, building_id=building_id),
+        User(id=demo_id("user:admin_demo"), username="admin_demo", email="admin@demo.com", role=UserRole.ADMINISTRADOR, building_id=building_id),
+        User(id=demo_id("user:proveedor_demo"), username="proveedor_demo", email="proveedor@demo.com", role=UserRole.PROVEEDOR, building_id=building_id)
     ]
     
-    for user in demo_users:
-        await db.users.insert_one(prepare_for_mongo(user.dict()))
+    await upsert_demo_documents(db.users, [prepare_for_mongo(user.dict()) for user in demo_users])
     
     # Create demo resident
     demo_resident = Resident(
+        id=demo_id("resident:301"),
         user_id=demo_users[0].id,
         first_name="Juan",
         last_name="Pérez",
@@ -226,53 +1569,51 @@ async def init_demo_data():
         unit_number="301",
         building_id=building_id
     )
-    await db.residents.insert_one(prepare_for_mongo(demo_resident.dict()))
+    await upsert_demo_documents(db.residents, [prepare_for_mongo(demo_resident.dict())])
     
     # Create demo properties
     demo_properties = [
-        Property(unit_number="301", floor=3, area_m2=85.5, property_value=350000.0, building_id=building_id, resident_id=demo_resident.id),
-        Property(unit_number="405", floor=4, area_m2=92.0, property_value=380000.0, building_id=building_id),
-        Property(unit_number="202", floor=2, area_m2=78.25, property_value=320000.0, building_id=building_id),
+        Property(id=demo_id("property:301"), unit_number="301", floor=3, area_m2=85.5, property_value=350000.0, building_id=building_id, resident_id=demo_resident.id),
+        Property(id=demo_id("property:405"), unit_number="405", floor=4, area_m2=92.0, property_value=380000.0, building_id=building_id),
+        Property(id=demo_id("property:202"), unit_number="202", floor=2, area_m2=78.25, property_value=320000.0, building_id=building_id),
     ]
     
-    for prop in demo_properties:
-        await db.properties.insert_one(prepare_for_mongo(prop.dict()))
+    await upsert_demo_documents(db.properties, [prepare_for_mongo(prop.dict()) for prop in demo_properties])
     
     # Create demo common areas
     demo_areas = [
-        CommonArea(name="Gimnasio", description="Gimnasio completamente equipado", capacity=15, price_per_hour=25.0, opening_time="06:00", closing_time="22:00", building_id=building_id),
-        CommonArea(name="Piscina", description="Piscina climatizada para adultos", capacity=30, price_per_hour=40.0, opening_time="08:00", closing_time="20:00", building_id=building_id),
-        CommonArea(name="Salón Social", description="Salón para eventos y reuniones", capacity=50, price_per_hour=60.0, opening_time="09:00", closing_time="23:00", building_id=building_id),
-        CommonArea(name="Co-working", description="Espacio de trabajo compartido", capacity=12, price_per_hour=15.0, opening_time="07:00", closing_time="21:00", building_id=building_id),
+        CommonArea(id=demo_id("area:Gimnasio"), name="Gimnasio", description="Gimnasio completamente equipado", capacity=15, price_per_hour=25.0, opening_time="06:00", closing_time="22:00", building_id=building_id),
+        CommonArea(id=demo_id("area:Piscina"), name="Piscina", description="Piscina climatizada para adultos", capacity=30, price_per_hour=40.0, opening_time="08:00", closing_time="20:00", building_id=building_id),
+        CommonArea(id=demo_id("area:Salón Social"), name="Salón Social", description="Salón para eventos y reuniones", capacity=50, price_per_hour=60.0, opening_time="09:00", closing_time="23:00", building_id=building_id),
+        CommonArea(id=demo_id("area:Co-working"), name="Co-working", description="Espacio de trabajo compartido", capacity=12, price_per_hour=15.0, opening_time="07:00", closing_time="21:00", building_id=building_id),
     ]
     
-    for area in demo_areas:
-        await db.common_areas.insert_one(prepare_for_mongo(area.dict()))
+    await upsert_demo_documents(db.common_areas, [prepare_for_mongo(area.dict()) for area in demo_areas])
     
     # Create demo payment concepts
     demo_concepts = [
-        PaymentConcept(name="Mantenimiento", description="Cuota mensual de mantenimiento", base_amount=280.0, frequency="MENSUAL", building_id=building_id),
-        PaymentConcept(name="Agua", description="Servicio de agua potable", base_amount=45.0, is_variable=True, frequency="MENSUAL", building_id=building_id),
-        PaymentConcept(name="Luz Común", description="Electricidad áreas comunes", base_amount=35.0, is_variable=True, frequency="MENSUAL", building_id=building_id),
-        PaymentConcept(name="Seguridad", description="Servicio de seguridad 24/7", base_amount=120.0, frequency="MENSUAL", building_id=building_id),
+        PaymentConcept(id=demo_id("concept:Mantenimiento"), name="Mantenimiento", description="Cuota mensual de mantenimiento", base_amount=280.0, frequency="MENSUAL", building_id=building_id),
+        PaymentConcept(id=demo_id("concept:Agua"), name="Agua", description="Servicio de agua potable", base_amount=45.0, is_variable=True, frequency="MENSUAL", building_id=building_id),
+        PaymentConcept(id=demo_id("concept:Luz Común"), name="Luz Común", description="Electricidad áreas comunes", base_amount=35.0, is_variable=True, frequency="MENSUAL", building_id=building_id),
+        PaymentConcept(id=demo_id("concept:Seguridad"), name="Seguridad", description="Servicio de seguridad 24/7", base_amount=120.0, frequency="MENSUAL", building_id=building_id),
     ]
     
-    for concept in demo_concepts:
-        await db.payment_concepts.insert_one(prepare_for_mongo(concept.dict()))
+    await upsert_demo_documents(db.payment_concepts, [prepare_for_mongo(concept.dict()) for concept in demo_concepts])
     
     # Create demo payments
     current_date = datetime.now(timezone.utc)
     demo_payments = [
-        Payment(resident_id=demo_resident.id, concept_id=demo_concepts[0].id, amount=280.0, due_date=(current_date + timedelta(days=5)).strftime("%Y-%m-%d"), status=PaymentStatus.PENDIENTE, building_id=building_id),
-        Payment(resident_id=demo_resident.id, concept_id=demo_concepts[1].id, amount=52.30, due_date=(current_date - timedelta(days=2)).strftime("%Y-%m-%d"), status=PaymentStatus.VENCIDO, building_id=building_id),
-        Payment(resident_id=demo_resident.id, concept_id=demo_concepts[2].id, amount=38.50, due_date=(current_date - timedelta(days=30)).strftime("%Y-%m-%d"), status=PaymentStatus.PAGADO, paid_date=(current_date - timedelta(days=25)).strftime("%Y-%m-%d"), building_id=building_id),
+        Payment(id=demo_id("payment:0"), resident_id=demo_resident.id, concept_id=demo_concepts[0].id, amount=280.0, due_date=(current_date + timedelta(days=5)).strftime("%Y-%m-%d"), status=PaymentStatus.PENDIENTE, building_id=building_id),
+        Payment(id=demo_id("payment:1"), resident_id=demo_resident.id, concept_id=demo_concepts[1].id, amount=52.30, due_date=(current_date - timedelta(days=2)).strftime("%Y-%m-%d"), status=PaymentStatus.VENCIDO, building_id=building_id),
+        Payment(id=demo_id("payment:2"), resident_id=demo_resident.id, concept_id=demo_concepts[2].id, amount=38.50, due_date=(current_date - timedelta(days=30)).strftime("%Y-%m-%d"), status=PaymentStatus.PAGADO, paid_date=(current_date - timedelta(days=25)).strftime("%Y-%m-%d"), building_id=building_id),
     ]
     
-    for payment in demo_payments:
-        await db.payments.insert_one(prepare_for_mongo(payment.dict()))
+    payment_docs = await upsert_demo_documents(db.payments, [prepare_for_mongo(payment.dict()) for payment in demo_payments])
+    await apply_summary_deltas(db, building_id, summary_deltas((p, None, p["status"]) for p in payment_docs))
     
     # Create demo voting
     demo_voting = Voting(
+        id=demo_id("voting:juegos"),
         title="¿Aprobar nueva área de juegos infantiles?",
         description="Propuesta para implementar un área de juegos para niños en la azotea del edificio. La inversión sería de S/ 15,000 aproximadamente.",
         start_date=current_date.strftime("%Y-%m-%d"),
@@ -282,26 +1623,33 @@ async def init_demo_data():
         building_id=building_id,
         created_by=demo_users[1].id
     )
-    await db.votings.insert_one(prepare_for_mongo(demo_voting.dict()))
+    await upsert_demo_documents(db.votings, [prepare_for_mongo(demo_voting.dict())])
     
     # Create demo reservations
     tomorrow = current_date + timedelta(days=1)
     demo_reservations = [
-        Reservation(common_area_id=demo_areas[0].id, resident_id=demo_resident.id, date=tomorrow.strftime("%Y-%m-%d"), start_time="19:00", end_time="21:00", status=ReservationStatus.CONFIRMADA, total_cost=50.0),
-        Reservation(common_area_id=demo_areas[1].id, resident_id=demo_resident.id, date=(tomorrow + timedelta(days=2)).strftime("%Y-%m-%d"), start_time="15:00", end_time="17:00", status=ReservationStatus.CONFIRMADA, total_cost=80.0),
+        Reservation(id=demo_id("reservation:0"), common_area_id=demo_areas[0].id, resident_id=demo_resident.id, date=tomorrow.strftime("%Y-%m-%d"), start_time="19:00", end_time="21:00", status=ReservationStatus.CONFIRMADA, total_cost=50.0),
+        Reservation(id=demo_id("reservation:1"), common_area_id=demo_areas[1].id, resident_id=demo_resident.id, date=(tomorrow + timedelta(days=2)).strftime("%Y-%m-%d"), start_time="15:00", end_time="17:00", status=ReservationStatus.CONFIRMADA, total_cost=80.0),
     ]
     
-    for reservation in demo_reservations:
-        await db.reservations.insert_one(prepare_for_mongo(reservation.dict()))
+    new_reservations = {r["id"] for r in await upsert_demo_documents(db.reservations, [prepare_for_mongo(reservation.dict()) for reservation in demo_reservations])}
+    if new_reservations:
+        await _insert_ignoring_duplicates(db.reservation_slots, [
+            slot for reservation in demo_reservations if reservation.id in new_reservations
+            for slot in reservation_slot_documents(reservation.dict())
+        ])
+    availability_index.invalidate()
     
     # Create demo incidents
     demo_incidents = [
-        Incident(title="Fuga de agua en el lobby", description="Se reporta una fuga de agua en el área del lobby principal, cerca de los ascensores.", category="Plomería", priority=Priority.ALTA, status=IncidentStatus.EN_PROCESO, reported_by=demo_resident.id, building_id=building_id),
-        Incident(title="Luz del estacionamiento no funciona", description="La luz del sector B del estacionamiento subterráneo no está funcionando desde hace 2 días.", category="Electricidad", priority=Priority.MEDIA, status=IncidentStatus.ABIERTA, reported_by=demo_resident.id, building_id=building_id),
+        Incident(id=demo_id("incident:0"), title="Fuga de agua en el lobby", description="Se reporta una fuga de agua en el área del lobby principal, cerca de los ascensores.", category="Plomería", priority=Priority.ALTA, status=IncidentStatus.EN_PROCESO, reported_by=demo_resident.id, building_id=building_id),
+        Incident(id=demo_id("incident:1"), title="Luz del estacionamiento no funciona", description="La luz del sector B del estacionamiento subterráneo no está funcionando desde hace 2 días.", category="Electricidad", priority=Priority.MEDIA, status=IncidentStatus.ABIERTA, reported_by=demo_resident.id, building_id=building_id),
     ]
     
-    for incident in demo_incidents:
-        await db.incidents.insert_one(prepare_for_mongo(incident.dict()))
+    await upsert_demo_documents(db.incidents, [prepare_for_mongo(incident.dict()) for incident in demo_incidents])
+    
+    for collection in ("common_areas", "votings", "incidents", "payments", "reservations"):
+        await bump_collection_version(db, collection, building_id)
 
 # API Routes
 @api_router.get("/")
@@ -313,91 +1661,131 @@ async def initialize_demo_data():
     await init_demo_data()
     return {"message": "Demo data initialized successfully"}
 
-@api_router.get("/resident/dashboard")
-async def get_resident_dashboard():
-    # Get demo building
-    building = await db.buildings.find_one({"is_demo": True})
-    if not building:
-        raise HTTPException(status_code=404, detail="Demo building not found")
-    
+# Collections shown on the resident dashboard; a change to any of them changes its ETag
+DASHBOARD_COLLECTIONS = ("payments", "reservations", "votings", "incidents")
+
+@api_router.get("/resident/dashboard", response_model=ResidentDashboard)
+async def get_resident_dashboard(response: Response, if_none_match: Annotated[Optional[str], Header()] = None):
+    # Get demo building and resident
+    building, resident = await get_demo_context()
     building_id = building["id"]
-    
-    # Get demo resident
-    resident = await db.residents.find_one({"building_id": building_id})
-    if not resident:
-        raise HTTPException(status_code=404, detail="Demo resident not found")
-    
     resident_id = resident["id"]
     
-    # Get payment summary
-    payments = await db.payments.find({"resident_id": resident_id}).to_list(100)
-    payments = [clean_mongo_doc(p) for p in payments]
-    pending_payments = [p for p in payments if p["status"] == "PENDIENTE"]
-    overdue_payments = [p for p in payments if p["status"] == "VENCIDO"]
-    
-    # Get upcoming reservations
-    current_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    reservations = await db.reservations.find({
-        "resident_id": resident_id,
-        "date": {"$gte": current_date},
-        "status": "CONFIRMADA"
-    }).to_list(10)
-    reservations = [clean_mongo_doc(r) for r in reservations]
-    
-    # Get active votings
-    active_votings = await db.votings.find({
-        "building_id": building_id,
-        "status": "ACTIVA"
-    }).to_list(10)
-    active_votings = [clean_mongo_doc(v) for v in active_votings]
+    current_date = today_utc()
     
-    # Get recent incidents
-    recent_incidents = await db.incidents.find({
-        "reported_by": resident_id,
-        "building_id": building_id
-    }).sort("created_at", -1).limit(5).to_list(5)
-    recent_incidents = [clean_mongo_doc(i) for i in recent_incidents]
+    # Upcoming reservations depend on the date, so it is part of the scope
+    etag = await combined_etag(DASHBOARD_COLLECTIONS, building_id, resident_id, current_date)
+    not_modified = conditional_response(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
     
-    return {
-        "resident": clean_mongo_doc(resident),
+    # The remaining queries are independent, issue them concurrently
+    payment_totals, reservations, active_votings, recent_incidents = await asyncio.gather(
+        # Payment summary, totalled by Mongo instead of loading every payment
+        db.payments.aggregate([
+            {"$match": {"resident_id": resident_id, "status": {"$in": ["PENDIENTE", "VENCIDO"]}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}, "total": {"$sum": "$amount"}}}
+        ]).to_list(None),
+        # Upcoming reservations
+        db.reservations.find({
+            "resident_id": resident_id,
+            "date": {"$gte": current_date},
+            "status": "CONFIRMADA"
+        }, RESERVATION_PROJECTION).to_list(10),
+        # Active votings
+        db.votings.find({
+            "building_id": building_id,
+            "status": "ACTIVA"
+        }, VOTING_PROJECTION).to_list(10),
+        # Recent incidents
+        db.incidents.find({
+            "reported_by": resident_id,
+            "building_id": building_id
+        }, INCIDENT_PROJECTION).sort("created_at", -1).limit(5).to_list(5)
+    )
+    totals = {group["_id"]: group for group in payment_totals}
+    pending = totals.get("PENDIENTE", {})
+    overdue = totals.get("VENCIDO", {})
+    
+    return orjson_response({
+        "resident": resident,
         "payments_summary": {
-            "pending_count": len(pending_payments),
-            "pending_total": sum(p["amount"] for p in pending_payments),
-            "overdue_count": len(overdue_payments),
-            "overdue_total": sum(p["amount"] for p in overdue_payments)
+            "pending_count": pending.get("count", 0),
+            "pending_total": pending.get("total", 0),
+            "overdue_count": overdue.get("count", 0),
+            "overdue_total": overdue.get("total", 0)
         },
-        "upcoming_reservations": reservations,
-        "active_votings": active_votings,
+        "upcoming_reservations": [serialize_dates(r) for r in reservations],
+        "active_votings": [serialize_dates(v) for v in active_votings],
         "recent_incidents": recent_incidents
-    }
+    }, response)
 
-@api_router.get("/common-areas")
-async def get_common_areas():
-    building = await db.buildings.find_one({"is_demo": True})
-    if not building:
-        raise HTTPException(status_code=404, detail="Demo building not found")
+@api_router.get("/common-areas", response_model=List[CommonArea])
+async def get_common_areas(response: Response, fields: Optional[str] = None,
+                           if_none_match: Annotated[Optional[str], Header()] = None):
+    building = await get_demo_building()
+    projection, _ = sparse_projection(fields, COMMON_AREA_PROJECTION)
     
-    areas = await db.common_areas.find({"building_id": building["id"], "is_active": True}).to_list(100)
-    return [clean_mongo_doc(area) for area in areas]
+    etag = await collection_etag("common_areas", building["id"], fields)
+    not_modified = conditional_response(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
+    
+    areas = await db.common_areas.find({"building_id": building["id"], "is_active": True}, projection).to_list(100)
+    return orjson_response(areas, response)
 
-@api_router.get("/reservations/{area_id}")
-async def get_area_reservations(area_id: str):
-    current_date = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-    reservations = await db.reservations.find({
+@api_router.get("/common-areas/{area_id}/availability")
+async def get_area_availability(area_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    area = await get_common_area(area_id)
+    
+    try:
+        start = datetime.strptime(start_date, "%Y-%m-%d") if start_date else datetime.now(timezone.utc).replace(tzinfo=None)
+        end = datetime.strptime(end_date, "%Y-%m-%d") if end_date else start
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Las fechas deben tener el formato YYYY-MM-DD")
+    days = (end.date() - start.date()).days + 1
+    if days < 1 or days > MAX_AVAILABILITY_DAYS:
+        raise HTTPException(status_code=400, detail=f"El rango debe ser de 1 a {MAX_AVAILABILITY_DAYS} días")
+    
+    dates = [(start + timedelta(days=offset)).strftime("%Y-%m-%d") for offset in range(days)]
+    bitmaps = await load_availability(area["id"], dates)
+    return {
+        "area_id": area["id"],
+        "slot_minutes": SLOT_MINUTES,
+        "opening_time": area["opening_time"],
+        "closing_time": area["closing_time"],
+        "days": [
+            {"date": date, "free": free_intervals(bitmaps[date], area["opening_time"], area["closing_time"])}
+            for date in dates
+        ]
+    }
+
+@api_router.get("/reservations/{area_id}", response_model=List[Reservation])
+async def get_area_reservations(area_id: str, response: Response, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None):
+    reservations = await paginate(db.reservations, {
         "common_area_id": area_id,
-        "date": {"$gte": current_date},
-        "status": {"$in": ["CONFIRMADA", "PENDIENTE"]}
-    }).to_list(100)
-    return [clean_mongo_doc(reservation) for reservation in reservations]
+        "date": {"$gte": today_utc()},
+        "status": {"$in": ACTIVE_RESERVATION_STATUSES}
+    }, [("date", ASCENDING), ("start_time", ASCENDING), ("id", ASCENDING)], response, limit, after,
+        RESERVATION_PROJECTION)
+    return orjson_response([serialize_dates(r) for r in reservations], response)
 
 @api_router.post("/reservations")
 async def create_reservation(reservation_data: dict):
     # Get demo resident
-    building = await db.buildings.find_one({"is_demo": True})
-    resident = await db.residents.find_one({"building_id": building["id"]})
+    building, resident = await get_demo_context()
+    area = await get_common_area(reservation_data["common_area_id"])
+    
+    try:
+        datetime.strptime(reservation_data["date"], "%Y-%m-%d")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Fecha inválida: {reservation_data['date']}")
+    if (parse_hhmm(reservation_data["start_time"]) < parse_hhmm(area["opening_time"])
+            or parse_hhmm(reservation_data["end_time"]) > parse_hhmm(area["closing_time"])):
+        raise HTTPException(status_code=400, detail=f"El horario de {area['name']} es de {area['opening_time']} a {area['closing_time']}")
     
     reservation = Reservation(
-        common_area_id=reservation_data["common_area_id"],
+        common_area_id=area["id"],
         resident_id=resident["id"],
         date=reservation_data["date"],
         start_time=reservation_data["start_time"],
@@ -406,48 +1794,128 @@ async def create_reservation(reservation_data: dict):
         total_cost=reservation_data["total_cost"]
     )
     
-    await db.reservations.insert_one(prepare_for_mongo(reservation.dict()))
-    return {"message": "Reserva creada exitosamente", "reservation": clean_mongo_doc(reservation.dict())}
+    # Claim the slots first, a conflicting booking fails here with 409
+    await claim_reservation_slots(reservation.dict())
+    try:
+        await db.reservations.insert_one(prepare_for_mongo(reservation.dict()))
+    except Exception:
+        await release_reservation_slots(reservation.id)
+        raise
+    availability_index.mark(reservation.common_area_id, reservation.date,
+                            reservation_slot_keys(reservation.start_time, reservation.end_time), taken=True)
+    await bump_collection_version(db, "reservations", building["id"])
+    return {"message": "Reserva creada exitosamente", "reservation": reservation.dict()}
+
+@api_router.post("/reservations/{reservation_id}/cancel")
+async def cancel_reservation(reservation_id: str):
+    building, resident = await get_demo_context()
+    
+    reservation = await db.reservations.find_one_and_update(
+        {"id": reservation_id, "resident_id": resident["id"], "status": {"$in": ACTIVE_RESERVATION_STATUSES}},
+        {"$set": {"status": ReservationStatus.CANCELADA.value}},
+        projection={"_id": 0}
+    )
+    if not reservation:
+        raise HTTPException(status_code=404, detail="Reserva no encontrada")
+    reservation["status"] = ReservationStatus.CANCELADA
+    serialize_dates(reservation)
+    
+    await release_reservation_slots(reservation_id)
+    try:
+        slots = reservation_slot_keys(reservation["start_time"], reservation["end_time"])
+    except HTTPException:
+        # Legacy times that do not map onto slots; reload the day instead
+        availability_index.discard(reservation["common_area_id"], reservation["date"])
+    else:
+        availability_index.mark(reservation["common_area_id"], reservation["date"], slots, taken=False)
+    await bump_collection_version(db, "reservations", building["id"])
+    return {"message": "Reserva cancelada exitosamente", "reservation": reservation}
 
-@api_router.get("/payments")
-async def get_resident_payments():
-    building = await db.buildings.find_one({"is_demo": True})
-    resident = await db.residents.find_one({"building_id": building["id"]})
+@api_router.get("/payments", response_model=List[PaymentWithConcept])
+async def get_resident_payments(response: Response, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                                fields: Optional[str] = None,
+                                if_none_match: Annotated[Optional[str], Header()] = None):
+    building, resident = await get_demo_context()
     
-    payments = await db.payments.find({"resident_id": resident["id"]}).to_list(100)
-    payments = [clean_mongo_doc(payment) for payment in payments]
+    etag = await collection_etag("payments", building["id"], resident["id"], limit, after, fields)
+    not_modified = conditional_response(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
+    
+    return orjson_response(await resident_payments_page(resident["id"], response, limit, after, fields), response)
+
+async def resident_payments_page(resident_id, response, limit=DEFAULT_PAGE_SIZE, after=None, fields=None):
+    sort = [("due_date", DESCENDING), ("id", DESCENDING)]
+    projection, requested = sparse_projection(fields, PAYMENT_PROJECTION, needed=("due_date", "id", "concept_id"),
+                                              virtual=("concept",))
+    payments = await paginate(db.payments, {"resident_id": resident_id}, sort, response, limit, after, projection)
     
-    # Get payment concepts for each payment
+    # Resolve every payment concept in a single batched query, unless the
+    # client left the concept out of its fieldset
+    concepts = {}
+    if requested is None or "concept" in requested:
+        concepts = await load_by_ids(db.payment_concepts, [payment["concept_id"] for payment in payments],
+                                     PAYMENT_CONCEPT_PROJECTION)
     for payment in payments:
-        concept = await db.payment_concepts.find_one({"id": payment["concept_id"]})
-        payment["concept"] = clean_mongo_doc(concept) if concept else None
+        serialize_dates(payment)
+        payment["concept"] = concepts.get(payment["concept_id"])
+    return trim_fields(payments, requested)
+
+@api_router.post("/payments/{payment_id}/pay")
+async def pay_payment(payment_id: str, response: Response, include: Optional[str] = None):
+    building, resident = await get_demo_context()
+    includes = parse_include(include, ("payments",))
+    
+    paid_date = today_utc()
+    payment = await db.payments.find_one_and_update(
+        {"id": payment_id, "resident_id": resident["id"],
+         "status": {"$in": [PaymentStatus.PENDIENTE, PaymentStatus.VENCIDO]}},
+        {"$set": {"status": PaymentStatus.PAGADO.value, "paid_date": paid_date}},
+        projection=PAYMENT_PROJECTION
+    )
+    if not payment:
+        raise HTTPException(status_code=404, detail="Pago pendiente no encontrado")
     
-    return payments
+    await apply_summary_deltas(db, payment["building_id"],
+                               summary_deltas([(payment, payment["status"], PaymentStatus.PAGADO)]))
+    await bump_collection_version(db, "payments", payment["building_id"])
+    payment.update(status=PaymentStatus.PAGADO, paid_date=paid_date)
+    result = {"message": "Pago registrado exitosamente", "payment": serialize_dates(payment)}
+    if "payments" in includes:
+        result["payments"] = await resident_payments_page(resident["id"], response)
+    return result
 
-@api_router.get("/votings")
-async def get_active_votings():
-    building = await db.buildings.find_one({"is_demo": True})
+@api_router.get("/votings", response_model=List[Voting])
+async def get_active_votings(response: Response, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                             fields: Optional[str] = None,
+                             if_none_match: Annotated[Optional[str], Header()] = None):
+    building = await get_demo_building()
     
-    votings = await db.votings.find({
-        "building_id": building["id"],
-        "status": "ACTIVA"
-    }).to_list(100)
+    etag = await collection_etag("votings", building["id"], limit, after, fields)
+    not_modified = conditional_response(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
     
-    return [clean_mongo_doc(voting) for voting in votings]
+    return orjson_response(await active_votings_page(building["id"], response, limit, after, fields), response)
+
+async def active_votings_page(building_id, response, limit=DEFAULT_PAGE_SIZE, after=None, fields=None):
+    projection, requested = sparse_projection(fields, VOTING_PROJECTION, needed=("created_at", "id"))
+    votings = await paginate(db.votings, {
+        "building_id": building_id,
+        "status": "ACTIVA"
+    }, [("created_at", DESCENDING), ("id", DESCENDING)], response, limit, after, projection)
+    return trim_fields([serialize_dates(voting) for voting in votings], requested)
 
 @api_router.post("/vote")
-async def cast_vote(vote_data: dict):
-    building = await db.buildings.find_one({"is_demo": True})
-    resident = await db.residents.find_one({"building_id": building["id"]})
-    
-    # Check if already voted
-    existing_vote = await db.votes.find_one({
-        "voting_id": vote_data["voting_id"],
-        "resident_id": resident["id"]
-    })
+async def cast_vote(vote_data: dict, response: Response, include: Optional[str] = None):
+    building, resident = await get_demo_context()
+    includes = parse_include(include, ("votings", "results"))
     
-    if existing_vote:
-        raise HTTPException(status_code=400, detail="Ya has votado en esta consulta")
+    voting = await db.votings.find_one({"id": vote_data["voting_id"]}, {"_id": 0, "id": 1, "title": 1, "status": 1, "options": 1})
+    if not voting:
+        raise HTTPException(status_code=404, detail="Votación no encontrada")
+    if vote_data["option"] not in voting["options"]:
+        raise HTTPException(status_code=400, detail="Opción de voto inválida")
     
     vote = Vote(
         voting_id=vote_data["voting_id"],
@@ -455,13 +1923,39 @@ async def cast_vote(vote_data: dict):
         option=vote_data["option"]
     )
     
-    await db.votes.insert_one(prepare_for_mongo(vote.dict()))
-    return {"message": "Voto registrado exitosamente"}
+    # The unique (voting_id, resident_id) index rejects a second vote, even when
+    # both requests arrive at the same time
+    try:
+        await db.votes.insert_one(prepare_for_mongo(vote.dict()))
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Ya has votado en esta consulta")
+    tally = await increment_vote_tally(vote.voting_id, voting["options"].index(vote.option))
+    result = {"message": "Voto registrado exitosamente"}
+    if "results" in includes:
+        # The tally returned by the increment already counts this vote
+        result["results"] = format_vote_results(voting, tally)
+    if "votings" in includes:
+        result["votings"] = await active_votings_page(building["id"], response)
+    return result
+
+@api_router.get("/votings/{voting_id}/results")
+async def get_voting_results(voting_id: str):
+    voting, tally = await asyncio.gather(
+        db.votings.find_one({"id": voting_id}, {"_id": 0, "id": 1, "title": 1, "status": 1, "options": 1}),
+        db.vote_tallies.find_one({"voting_id": voting_id}, {"_id": 0})
+    )
+    if not voting:
+        raise HTTPException(status_code=404, detail="Votación no encontrada")
+    return format_vote_results(voting, tally)
+
+@api_router.post("/admin/vote-tallies/reconcile")
+async def reconcile_tallies(voting_id: Optional[str] = None):
+    return await reconcile_vote_tallies(db, voting_id)
 
 @api_router.post("/incidents")
-async def create_incident(incident_data: dict):
-    building = await db.buildings.find_one({"is_demo": True})
-    resident = await db.residents.find_one({"building_id": building["id"]})
+async def create_incident(incident_data: dict, response: Response, include: Optional[str] = None):
+    building, resident = await get_demo_context()
+    includes = parse_include(include, ("incidents",))
     
     incident = Incident(
         title=incident_data["title"],
@@ -475,30 +1969,485 @@ async def create_incident(incident_data: dict):
     )
     
     await db.incidents.insert_one(prepare_for_mongo(incident.dict()))
-    return {"message": "Incidencia reportada exitosamente", "incident": clean_mongo_doc(incident.dict())}
+    await bump_collection_version(db, "incidents", building["id"])
+    result = {"message": "Incidencia reportada exitosamente", "incident": incident.dict()}
+    if "incidents" in includes:
+        result["incidents"] = await resident_incidents_page(building["id"], resident["id"], response)
+    return result
 
-@api_router.get("/incidents")
-async def get_resident_incidents():
-    building = await db.buildings.find_one({"is_demo": True})
-    resident = await db.residents.find_one({"building_id": building["id"]})
+@api_router.get("/incidents", response_model=List[Incident])
+async def get_resident_incidents(response: Response, limit: int = DEFAULT_PAGE_SIZE, after: Optional[str] = None,
+                                 fields: Optional[str] = None,
+                                 if_none_match: Annotated[Optional[str], Header()] = None):
+    building, resident = await get_demo_context()
     
-    incidents = await db.incidents.find({
-        "reported_by": resident["id"],
-        "building_id": building["id"]
-    }).sort("created_at", -1).to_list(100)
+    etag = await collection_etag("incidents", building["id"], resident["id"], limit, after, fields)
+    not_modified = conditional_response(response, etag, if_none_match)
+    if not_modified:
+        return not_modified
     
-    return [clean_mongo_doc(incident) for incident in incidents]
+    return orjson_response(await resident_incidents_page(building["id"], resident["id"], response, limit, after, fields), response)
 
-# Include the router in the main app
-app.include_router(api_router)
+async def resident_incidents_page(building_id, resident_id, response, limit=DEFAULT_PAGE_SIZE, after=None, fields=None):
+    projection, requested = sparse_projection(fields, INCIDENT_PROJECTION, needed=("created_at", "id"))
+    incidents = await paginate(db.incidents, {
+        "reported_by": resident_id,
+        "building_id": building_id
+    }, [("created_at", DESCENDING), ("id", DESCENDING)], response, limit, after, projection)
+    return trim_fields(incidents, requested)
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Collections that can be exported, with the field tying them to a building
+EXPORT_COLLECTIONS = {
+    "residents": "building_id",
+    "properties": "building_id",
+    "common_areas": "building_id",
+    "payment_concepts": "building_id",
+    "payments": "building_id",
+    "votings": "building_id",
+    "incidents": "building_id",
+}
+
+@api_router.post("/admin/billing-runs")
+async def create_billing_run(billing_data: dict):
+    building_id = billing_data.get("building_id") or (await get_demo_building())["id"]
+    if not await db.buildings.find_one({"id": building_id}, {"_id": 1}):
+        raise HTTPException(status_code=404, detail="Edificio no encontrado")
+    return await run_billing(db, building_id, billing_data.get("period"))
+
+@api_router.get("/admin/financial-summary")
+async def get_financial_summary(building_id: Optional[str] = None):
+    building_id = building_id or (await get_demo_building())["id"]
+    summary = await db.financial_summaries.find_one({"_id": building_id})
+    concept_ids = {cell.split("|")[0] for cell in (summary or {}).get("cells", {})}
+    concepts = await load_by_ids(db.payment_concepts, concept_ids, {"_id": 0, "id": 1, "name": 1})
+    return format_financial_summary(building_id, summary, concepts)
+
+@api_router.post("/admin/financial-summaries/rebuild")
+async def rebuild_summaries(building_id: Optional[str] = None):
+    started = perf_counter()
+    await rebuild_financial_summaries(db, building_id)
+    return {"message": "Resúmenes financieros recalculados", "duration_ms": round((perf_counter() - started) * 1000, 2)}
+
+@api_router.get("/admin/jobs")
+async def get_job_metrics():
+    return job_metrics
+
+@api_router.get("/health/ready")
+async def readiness():
+    # Ready once this worker's client can reach the server within the timeout
+    if db is None:
+        return ORJSONResponse(status_code=503, content={"status": "starting", "pid": os.getpid()})
+    try:
+        await asyncio.wait_for(db.command("ping"), READINESS_TIMEOUT_SECONDS)
+    except (PyMongoError, asyncio.TimeoutError) as e:
+        return ORJSONResponse(status_code=503, content={"status": "unavailable", "pid": os.getpid(), "error": str(e) or type(e).__name__})
+    return {"status": "ready", "pid": os.getpid(), "startup": startup_metrics}
+
+@api_router.get("/health/pool")
+async def pool_utilization():
+    return {"pid": os.getpid(), "options": mongo_client_options(), "pool": pool_metrics.snapshot()}
+
+@api_router.get("/events")
+async def stream_events():
+    # Server-sent events for the demo building; clients refetch the collection
+    # named in each "change" event (cheaply, with their ETag) and everything on
+    # "resync"
+    building = await get_demo_building()
+    building_id = building["id"]
+    queue = event_hub.subscribe(building_id)
+    
+    async def stream():
+        try:
+            yield f"retry: 5000\n\n{format_sse({'type': 'ready', 'building_id': building_id})}"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                yield format_sse(event)
+        finally:
+            event_hub.unsubscribe(building_id, queue)
+    
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@api_router.get("/admin/export/{collection}")
+async def export_collection(collection: str):
+    building = await get_demo_building()
+    if collection not in EXPORT_COLLECTIONS:
+        raise HTTPException(status_code=404, detail=f"Colección no exportable: {collection}")
+    
+    cursor = db[collection].find({EXPORT_COLLECTIONS[collection]: building["id"]}, {"_id": 0}).batch_size(1000)
+    
+    # Documents are written as they arrive from the cursor, nothing is buffered
+    async def stream_documents():
+        async for doc in cursor:
+            yield orjson.dumps(serialize_dates(doc)) + b"\n"
+    
+    return StreamingResponse(stream_documents(), media_type="application/x-ndjson")
+
+# Metrics
+# Prometheus text exposition, hand-rolled to avoid another dependency. Values
+# are kept per worker process, so each uvicorn worker reports its own series.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+class Counter:
+    kind = "counter"
+    
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.label_names, labels)} {value}")
+        return lines
+
+class Gauge(Counter):
+    kind = "gauge"
+    
+    def set(self, value, labels=()):
+        with self._lock:
+            self.values[labels] = value
+
+class Histogram(Counter):
+    kind = "histogram"
+    
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = buckets
+    
+    def observe(self, value, labels=()):
+        with self._lock:
+            series = self.values.get(labels)
+            if series is None:
+                series = self.values[labels] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+    
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        names = (*self.label_names, "le")
+        with self._lock:
+            for labels, series in sorted(self.values.items()):
+                for bound, count in zip(self.buckets, series["buckets"]):
+                    lines.append(f"{self.name}_bucket{format_labels(names, (*labels, bound))} {count}")
+                lines.append(f"{self.name}_bucket{format_labels(names, (*labels, '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {series['sum']}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {series['count']}")
+        return lines
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route"))
+http_request_db_duration = Histogram(
+    "http_request_db_duration_seconds", "Time spent in MongoDB commands per HTTP request.", ("method", "route"))
+http_requests_total = Counter(
+    "http_requests_total", "HTTP responses by route and status code.", ("method", "route", "status"))
+http_request_exceptions = Counter(
+    "http_request_exceptions_total", "Requests that raised an unhandled exception.", ("method", "route"))
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests being served, open event streams included.")
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection.", ("command", "collection"))
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands by collection.", ("command", "collection"))
+demo_init_requests = Counter(
+    "demo_init_requests_total", "Demo initialization checks by where they were answered from.", ("source",))
+demo_init_seeds = Counter("demo_init_seeds_total", "Demo seeds run by this worker.")
+event_clients = Gauge("event_stream_clients", "Open /api/events connections.")
+event_overflows = Counter("event_stream_overflows_total", "Client queues replaced by a resync because the client fell behind.")
+mongo_pool_gauges = {
+    key: Gauge(f"mongodb_pool_{key}", f"Connection pool {key.replace('_', ' ')}.")
+    for key in ("open", "checked_out", "waiting", "checkouts", "checkout_failures", "pool_clears")
+}
+
+METRICS = [
+    http_request_duration, http_request_db_duration, http_requests_total, http_request_exceptions,
+    http_requests_in_flight, mongo_command_duration, mongo_command_failures, demo_init_requests, demo_init_seeds,
+    event_clients, event_overflows, *mongo_pool_gauges.values(),
+]
+
+# Request tracing
+# Every Mongo command issued while serving a request is recorded on the
+# request's RequestTrace, held in a contextvar. Motor runs pymongo calls with a
+# copy of the caller's context, so the listeners below append to the trace of
+# the request that issued the command. Requests slower than
+# TRACE_SLOW_REQUEST_MS are logged with their full query breakdown; sending
+# X-Debug-Trace: 1 logs any request and adds X-DB-Calls / X-DB-Time-Ms headers.
+TRACE_SLOW_REQUEST_MS = float(os.environ.get("TRACE_SLOW_REQUEST_MS", "500"))
+TRACE_DEBUG_HEADER = b"x-debug-trace"
+TRACE_MAX_COMMANDS = 500
+trace_logger = logging.getLogger("server.trace")
+
+class RequestTrace:
+    __slots__ = ("forced", "db_seconds", "commands")
+    
+    def __init__(self, forced=False):
+        self.forced = forced
+        self.db_seconds = 0.0
+        self.commands = []
+
+request_trace = ContextVar("request_trace", default=None)
+
+def query_shape(value):
+    # Keeps operators and field names, hides values: {"status": {"$in": ["?"]}}
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [query_shape(value[0])] if value else []
+    return "?"
+
+def command_shape(command_name, command):
+    if command_name == "aggregate":
+        return query_shape(command.get("pipeline", []))
+    if command_name in ("update", "delete"):
+        operations = command.get(f"{command_name}s") or [{}]
+        return query_shape(operations[0].get("q", {}))
+    spec = command.get("filter", command.get("query"))
+    if spec is None:
+        return None
+    shape = {"filter": query_shape(spec)}
+    if command.get("sort"):
+        shape["sort"] = dict(command["sort"])
+    return shape
+
+def reply_documents(reply):
+    cursor = reply.get("cursor")
+    if cursor is not None:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:
+        return int(reply["value"] is not None)
+    if "values" in reply:
+        return len(reply["values"])
+    return reply.get("n")
+
+class CommandMetrics(CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+    
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else ""
+        trace = request_trace.get()
+        entry = None
+        if trace is not None and len(trace.commands) < TRACE_MAX_COMMANDS:
+            # The shape is computed when the trace is logged, not per command
+            entry = {"command": event.command_name, "collection": collection, "spec": event.command}
+            trace.commands.append(entry)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, entry)
+    
+    def _finish(self, event):
+        with self._lock:
+            collection, entry = self._pending.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1e6
+        trace = request_trace.get()
+        if trace is not None:
+            trace.db_seconds += seconds
+        if entry is not None:
+            entry["duration_ms"] = round(seconds * 1000, 3)
+        return (event.command_name, collection), seconds, entry
+    
+    def succeeded(self, event):
+        labels, seconds, entry = self._finish(event)
+        if entry is not None:
+            entry["docs"] = reply_documents(event.reply)
+        mongo_command_duration.observe(seconds, labels)
+    
+    def failed(self, event):
+        labels, seconds, entry = self._finish(event)
+        if entry is not None:
+            entry["failed"] = True
+        mongo_command_duration.observe(seconds, labels)
+        mongo_command_failures.inc(labels)
+
+command_metrics = CommandMetrics()
+
+def log_trace(method, path, status, elapsed_ms, trace):
+    lines = [
+        f"{'Slow request' if elapsed_ms >= TRACE_SLOW_REQUEST_MS else 'Traced request'} {method} {path} -> {status} "
+        f"in {elapsed_ms:.1f} ms, {len(trace.commands)} db commands in {trace.db_seconds * 1000:.1f} ms"
+    ]
+    for entry in trace.commands:
+        outcome = "failed" if entry.get("failed") else f"{entry.get('docs')} docs"
+        shape = command_shape(entry["command"], entry["spec"])
+        lines.append(
+            f"  {entry.get('duration_ms', 0):8.2f} ms  {entry['command']} {entry['collection']} -> {outcome}"
+            + (f"  {json_util.dumps(shape)}" if shape is not None else "")
+        )
+    level = logging.WARNING if elapsed_ms >= TRACE_SLOW_REQUEST_MS else logging.INFO
+    trace_logger.log(level, "\n".join(lines))
+
+class InstrumentationMiddleware:
+    # Plain ASGI middleware: the route template is read from the scope after
+    # routing, so /api/payments/{payment_id}/pay is one series, not one per id
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+        streaming = [False]
+        trace = RequestTrace(forced=dict(scope["headers"]).get(TRACE_DEBUG_HEADER) in (b"1", b"true"))
+        
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                streaming[0] = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                   for name, value in message.get("headers", []))
+                if trace.forced:
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"x-db-calls", str(len(trace.commands)).encode()),
+                        (b"x-db-time-ms", f"{trace.db_seconds * 1000:.2f}".encode()),
+                    ]
+            await send(message)
+        
+        token = request_trace.set(trace)
+        http_requests_in_flight.inc()
+        started = perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception:
+            http_request_exceptions.inc((scope["method"], route_label(scope)))
+            raise
+        finally:
+            elapsed = perf_counter() - started
+            http_requests_in_flight.inc(amount=-1)
+            request_trace.reset(token)
+            labels = (scope["method"], route_label(scope))
+            http_request_duration.observe(elapsed, labels)
+            http_request_db_duration.observe(trace.db_seconds, labels)
+            http_requests_total.inc((*labels, status[0]))
+            # Event streams stay open by design and are not slow requests
+            if trace.forced or (elapsed * 1000 >= TRACE_SLOW_REQUEST_MS and not streaming[0]):
+                log_trace(scope["method"], scope["path"], status[0], elapsed * 1000, trace)
+
+def route_label(scope):
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+def render_metrics():
+    event_clients.set(event_hub.clients)
+    for key, value in pool_metrics.snapshot().items():
+        if key in mongo_pool_gauges:
+            mongo_pool_gauges[key].set(value)
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Response compression
+# Responses are compressed with brotli or gzip, whichever the client accepts
+# (brotli first), once the body reaches COMPRESSION_MIN_BYTES; smaller bodies
+# cost more to compress than they save. Streamed bodies (the NDJSON export) are
+# compressed chunk by chunk and flushed so each chunk still reaches the client
+# as it is produced. Event streams are left alone: their messages are tiny and
+# must not wait in a compressor buffer.
+COMPRESSION_MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+COMPRESSIBLE_TYPES = (b"application/json", b"application/x-ndjson", b"text/plain", b"text/html", b"text/csv")
+
+def negotiate_encoding(accept_encoding):
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip().lower()] = weight
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if weights.get(encoding, weights.get("*", 0.0)) > 0:
+            return encoding
+    return None
+
+# Returns (compress, flush, finish) callables for the chosen encoding
+def create_compressor(encoding):
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+class CompressionMiddleware:
+    # Plain ASGI middleware, so streamed responses keep streaming
+    def __init__(self, app, minimum_size=None):
+        self.app = app
+        self.minimum_size = COMPRESSION_MIN_BYTES if minimum_size is None else minimum_size
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        encoding = negotiate_encoding(dict(scope["headers"]).get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            return await self.app(scope, receive, send)
+        start = None
+        compressor = None
+        
+        async def send_compressed(message):
+            nonlocal start, compressor
+            if message["type"] == "http.response.start":
+                # Held back until the first body chunk shows whether to compress
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                return await send(message)
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if start is not None:
+                # A copy, so a response object sent twice keeps its own headers
+                headers = MutableHeaders(raw=list(start["headers"]))
+                content_type = headers.get("content-type", "").encode("latin-1")
+                if (
+                    "content-encoding" not in headers
+                    and content_type.startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                ):
+                    compressor = create_compressor(encoding)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    del headers["content-length"]
+                    compress, flush, finish = compressor
+                    body = compress(body) + (flush() if more_body else finish())
+                    if not more_body:
+                        headers["Content-Length"] = str(len(body))
+                await send({**start, "headers": headers.raw})
+                start = None
+            elif compressor is not None:
+                compress, flush, finish = compressor
+                body = compress(body) + (flush() if more_body else finish())
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        
+        await self.app(scope, receive, send_compressed)
 
 # Configure logging
 logging.basicConfig(
@@ -507,11 +2456,102 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("startup")
-async def startup_event():
-    await init_demo_data()
-    logger.info("Demo data initialized")
+# Per-worker startup timings, reported by /api/health/ready
+startup_metrics = {}
+
+def startup_fingerprint():
+    # Changes whenever the index specs change, so a deploy with new indexes
+    # runs the one-time initialization again
+    specs = {name: [model.document for model in models] for name, models in INDEX_SPECS.items()}
+    return hashlib.sha1(json_util.dumps(specs).encode()).hexdigest()
+
+async def run_startup_init(database):
+    # Index builds, slot backfill and demo seeding run once per deploy: the
+    # worker that takes the startup lock does them while the others wait on
+    # the lock and then find the marker. Returns this worker's role.
+    role = await run_startup_once(database)
+    # The audit is not part of the once-per-deploy work: ROUTE_QUERIES can
+    # change without the index specs changing, so with the flag set every
+    # worker explains the route queries against the indexes now in place
+    if os.environ.get("QUERY_PLAN_AUDIT", "").lower() in ("1", "true", "yes"):
+        await audit_query_plans(database)
+        logger.info("Query plan audit passed")
+    return role
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+async def run_startup_once(database):
+    fingerprint = startup_fingerprint()
+    state = await database.init_state.find_one({"_id": "startup"})
+    if state and state.get("fingerprint") == fingerprint:
+        return "follower"
+    async with hold_lock(database, "startup"):
+        state = await database.init_state.find_one({"_id": "startup"})
+        if state and state.get("fingerprint") == fingerprint:
+            return "follower"
+        await ensure_indexes(database)
+        logger.info("Indexes ensured")
+        await backfill_reservation_slots(database)
+        await init_demo_data()
+        logger.info("Demo data initialized")
+        await database.init_state.update_one(
+            {"_id": "startup"},
+            {"$set": {"fingerprint": fingerprint, "completed_at": datetime.now(timezone.utc), "pid": os.getpid()}},
+            upsert=True
+        )
+    return "leader"
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global client, db
+    started = perf_counter()
+    client = create_mongo_client(event_listeners=[command_metrics])
+    db = client[os.environ['DB_NAME']]
+    logger.info("MongoDB client created with %s", mongo_client_options() or "default pool options")
+    
+    role = await run_startup_init(db)
+    startup_metrics.update({
+        "pid": os.getpid(),
+        "role": role,
+        "duration_ms": round((perf_counter() - started) * 1000, 2),
+        "ready_at": datetime.now(timezone.utc).isoformat()
+    })
+    logger.info("Worker %d ready as %s in %.1f ms", os.getpid(), role, startup_metrics["duration_ms"])
+    
+    jobs = [
+        asyncio.create_task(run_periodically(
+            "overdue_sweeper", OVERDUE_SWEEP_INTERVAL_SECONDS,
+            run_exclusive(db, "overdue_sweeper", lambda: sweep_overdue_payments(db))
+        )),
+        asyncio.create_task(watch_collection_versions(db, event_hub)),
+    ]
+    yield
+    
+    for job in jobs:
+        job.cancel()
+    for job in jobs:
+        with suppress(asyncio.CancelledError):
+            await job
+    client.close()
+    client = db = None
+
+# Create the main app without a prefix
+app = FastAPI(lifespan=lifespan)
+
+# Include the router in the main app
+app.include_router(api_router)
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+app.add_middleware(CompressionMiddleware)
+
+app.add_middleware(InstrumentationMiddleware)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_credentials=True,
+    allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-DB-Calls", "X-DB-Time-Ms", "ETag"],
+)
@@ -183,6 +183,10 @@ def test_common_areas():
         print_error(f"Failed to load common areas: {e}")
         return False
 
+def to_minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
 def test_reservations():
     """Test 5: Reservations - Test creating a reservation via POST /api/reservations"""
     print_test_header("Reservations")
@@ -202,21 +206,41 @@ def test_reservations():
         # Use the first available area (Gimnasio)
         test_area = areas[0]
         
-        # Create a reservation for tomorrow
+        # Create a reservation for tomorrow in a free slot; the demo data (and
+        # earlier runs) already book part of the day, and overlaps answer 409
         tomorrow = (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+        availability_response = requests.get(f"{BASE_URL}/common-areas/{test_area['id']}/availability",
+                                             params={"start_date": tomorrow, "end_date": tomorrow},
+                                             timeout=TIMEOUT)
+        if availability_response.status_code != 200:
+            print_error(f"Cannot test reservations - availability failed with status {availability_response.status_code}")
+            return False
+        
+        free = [interval for interval in availability_response.json()["days"][0]["free"]
+                if to_minutes(interval["end_time"]) - to_minutes(interval["start_time"]) >= 60]
+        if not free:
+            print_warning(f"No free hour left for {test_area['name']} on {tomorrow}, skipping booking")
+            return True
         
+        start = to_minutes(free[0]["start_time"])
+        hours = min(2, (to_minutes(free[0]["end_time"]) - start) // 60)
         reservation_data = {
             "common_area_id": test_area["id"],
             "date": tomorrow,
-            "start_time": "18:00",
-            "end_time": "20:00",
-            "total_cost": test_area["price_per_hour"] * 2  # 2 hours
+            "start_time": f"{start // 60:02d}:{start % 60:02d}",
+            "end_time": f"{(start + hours * 60) // 60:02d}:{(start + hours * 60) % 60:02d}",
+            "total_cost": test_area["price_per_hour"] * hours
         }
         
         response = requests.post(f"{BASE_URL}/reservations", 
                                json=reservation_data, 
                                timeout=TIMEOUT)
         
+        if response.status_code == 409:
+            # Someone took the slot between the availability check and the booking
+            print_warning(f"Slot was booked meanwhile (409): {response.json().get('detail')}")
+            return True
+        
         if response.status_code == 200:
             data = response.json()
             
@@ -239,6 +263,13 @@ def test_reservations():
                         print_info(f"Reservation ID: {reservation['id']}")
                         print_info(f"Status: {reservation['status']}")
                 
+                # Booking the same slot again must be rejected as an overlap
+                overlap = requests.post(f"{BASE_URL}/reservations", json=reservation_data, timeout=TIMEOUT)
+                if overlap.status_code != 409:
+                    print_error(f"Overlapping reservation returned {overlap.status_code}, expected 409")
+                    return False
+                print_success("Overlapping reservation rejected with 409")
+                
                 return True
             else:
                 print_error(f"Unexpected reservation response: {data}")
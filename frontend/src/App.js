@@ -270,6 +270,12 @@ const ResidentLayout = ({ children }) => {
   );
 };
 
+// Collections whose changes show up on the resident dashboard
+const DASHBOARD_COLLECTIONS = ['payments', 'reservations', 'votings', 'incidents'];
+// Events reach every resident of the building at once, so reloads wait a
+// random delay in this range to spread them out
+const RELOAD_DELAY_MS = [500, 5000];
+
 // Resident Dashboard
 const ResidentDashboard = () => {
   const [dashboardData, setDashboardData] = useState(null);
@@ -288,6 +294,31 @@ const ResidentDashboard = () => {
     };
 
     fetchDashboard();
+
+    // Reload when the server reports a change to something shown here;
+    // events arriving while a reload is pending are folded into it
+    let reloadTimer = null;
+    const scheduleReload = () => {
+      if (reloadTimer) return;
+      const [min, max] = RELOAD_DELAY_MS;
+      reloadTimer = setTimeout(() => {
+        reloadTimer = null;
+        fetchDashboard();
+      }, min + Math.random() * (max - min));
+    };
+
+    const events = new EventSource(`${API}/events`);
+    events.addEventListener('change', (event) => {
+      const { collection } = JSON.parse(event.data);
+      if (DASHBOARD_COLLECTIONS.includes(collection)) {
+        scheduleReload();
+      }
+    });
+    events.addEventListener('resync', scheduleReload);
+    return () => {
+      events.close();
+      clearTimeout(reloadTimer);
+    };
   }, []);
 
   if (loading) {
@@ -438,7 +469,9 @@ const ResidentReservations = () => {
   useEffect(() => {
     const fetchCommonAreas = async () => {
       try {
-        const response = await axios.get(`${API}/common-areas`);
+        const response = await axios.get(`${API}/common-areas`, {
+          params: { fields: 'id,name,description,capacity,price_per_hour,opening_time,closing_time' }
+        });
         setCommonAreas(response.data);
       } catch (error) {
         console.error("Error fetching common areas:", error);
@@ -612,7 +645,9 @@ const ResidentFinances = () => {
   useEffect(() => {
     const fetchPayments = async () => {
       try {
-        const response = await axios.get(`${API}/payments`);
+        const response = await axios.get(`${API}/payments`, {
+          params: { fields: 'id,concept,amount,due_date,status,paid_date' }
+        });
         setPayments(response.data);
       } catch (error) {
         console.error("Error fetching payments:", error);
@@ -717,7 +752,9 @@ const ResidentVoting = () => {
   useEffect(() => {
     const fetchVotings = async () => {
       try {
-        const response = await axios.get(`${API}/votings`);
+        const response = await axios.get(`${API}/votings`, {
+          params: { fields: 'id,title,description,start_date,end_date,status,options' }
+        });
         setVotings(response.data);
       } catch (error) {
         console.error("Error fetching votings:", error);
@@ -731,14 +768,13 @@ const ResidentVoting = () => {
 
   const handleVote = async (votingId, option) => {
     try {
-      await axios.post(`${API}/vote`, {
+      const response = await axios.post(`${API}/vote`, {
         voting_id: votingId,
         option: option
-      });
+      }, { params: { include: 'votings' } });
       alert('¡Voto registrado exitosamente!');
-      // Refresh votings
-      const response = await axios.get(`${API}/votings`);
-      setVotings(response.data);
+      // The refreshed votings come back with the vote
+      setVotings(response.data.votings);
     } catch (error) {
       if (error.response?.status === 400) {
         alert(error.response.data.detail);
@@ -823,7 +859,9 @@ const ResidentIncidents = () => {
   useEffect(() => {
     const fetchIncidents = async () => {
       try {
-        const response = await axios.get(`${API}/incidents`);
+        const response = await axios.get(`${API}/incidents`, {
+          params: { fields: 'title,description,category,priority,status,created_at' }
+        });
         setIncidents(response.data);
       } catch (error) {
         console.error("Error fetching incidents:", error);
@@ -838,13 +876,12 @@ const ResidentIncidents = () => {
   const handleSubmit = async (e) => {
     e.preventDefault();
     try {
-      await axios.post(`${API}/incidents`, newIncident);
+      const response = await axios.post(`${API}/incidents`, newIncident, { params: { include: 'incidents' } });
       alert('¡Incidencia reportada exitosamente!');
       setShowForm(false);
       setNewIncident({ title: '', description: '', category: '', priority: 'MEDIA' });
-      // Refresh incidents
-      const response = await axios.get(`${API}/incidents`);
-      setIncidents(response.data);
+      // The refreshed incidents come back with the new one
+      setIncidents(response.data.incidents);
     } catch (error) {
       console.error("Error creating incident:", error);
       alert('Error al reportar la incidencia');
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "edificio_test")
+
+import server  # noqa: E402
+
+# Collection methods that each cost one round-trip to Mongo
+DB_CALLS = {
+    "find", "find_one", "aggregate", "count_documents", "distinct",
+    "insert_one", "insert_many", "update_one", "update_many",
+    "find_one_and_update", "delete_one", "delete_many", "bulk_write",
+}
+
+
+class CountingCollection:
+    def __init__(self, collection, calls):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if name in DB_CALLS:
+            def counted(*args, **kwargs):
+                self._calls.append((self._collection.name, name))
+                return attr(*args, **kwargs)
+            return counted
+        return attr
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+        self.calls = []
+
+    def __getitem__(self, name):
+        return CountingCollection(self._database[name], self.calls)
+
+    def command(self, *args, **kwargs):
+        self.calls.append(("$cmd", "command"))
+        return self._database.command(*args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    database = CountingDatabase(AsyncMongoMockClient()[os.environ["DB_NAME"]])
+    monkeypatch.setattr(server, "db", database)
+    asyncio.run(server.ensure_indexes(database))
+    server.invalidate_demo_context()
+    server.forget_demo_seed()
+    server.availability_index.invalidate()
+    yield database
+    server.invalidate_demo_context()
+    server.forget_demo_seed()
+    server.availability_index.invalidate()
@@ -0,0 +1,31 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def test_billing_run_is_idempotent(mock_db):
+    async def run():
+        await server.init_demo_data()
+        building = await server.db.buildings.find_one({"is_demo": True})
+        first = await server.run_billing(server.db, building["id"], "2030-02", batch_size=2)
+        second = await server.run_billing(server.db, building["id"], "2030-02", batch_size=2)
+        billed = await server.db.payments.count_documents({"billing_key": {"$exists": True}})
+        return first, second, billed
+
+    first, second, billed = asyncio.run(run())
+    assert first["inserted"] == first["residents"] * first["concepts"] == 4
+    assert second["inserted"] == 0 and second["skipped"] == 4
+    assert billed == 4
+
+
+def test_billing_rejects_bad_period(mock_db):
+    async def run():
+        await server.init_demo_data()
+        with pytest.raises(HTTPException) as error:
+            await server.create_billing_run({"period": "febrero"})
+        return error.value
+
+    assert asyncio.run(run()).status_code == 400
@@ -0,0 +1,128 @@
+import asyncio
+import gzip
+
+import brotli
+import httpx
+import orjson
+import pytest
+from fastapi import Response
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+import server
+
+
+def compressed_app(response, minimum_size=100):
+    async def app(scope, receive, send):
+        await response(scope, receive, send)
+    return server.CompressionMiddleware(app, minimum_size=minimum_size)
+
+
+def fetch(app, accept_encoding):
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            request = http.build_request("GET", "/", headers={"Accept-Encoding": accept_encoding})
+            response = await http.send(request, stream=True)
+            raw = b"".join([chunk async for chunk in response.aiter_raw()])
+            await response.aclose()
+            return response.headers, raw
+
+    return asyncio.run(run())
+
+
+def test_negotiates_brotli_before_gzip():
+    assert server.negotiate_encoding("gzip, deflate, br") == "br"
+    assert server.negotiate_encoding("gzip, br;q=0") == "gzip"
+    assert server.negotiate_encoding("identity") is None
+    assert server.negotiate_encoding("*") == "br"
+    assert server.negotiate_encoding("") is None
+
+
+def test_large_json_is_compressed():
+    payload = [{"id": str(index), "status": "PENDIENTE", "due_date": "2024-01-15"} for index in range(50)]
+    app = compressed_app(ORJSONResponse(payload))
+
+    headers, raw = fetch(app, "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert headers["vary"] == "Accept-Encoding"
+    assert int(headers["content-length"]) == len(raw)
+    assert orjson.loads(gzip.decompress(raw)) == payload
+
+    headers, raw = fetch(app, "br, gzip")
+    assert headers["content-encoding"] == "br"
+    assert orjson.loads(brotli.decompress(raw)) == payload
+
+
+def test_small_and_uncompressible_bodies_pass_through():
+    headers, raw = fetch(compressed_app(ORJSONResponse({"ok": True})), "gzip")
+    assert "content-encoding" not in headers
+    assert orjson.loads(raw) == {"ok": True}
+
+    events = StreamingResponse(iter([b"data: x\n\n" * 50]), media_type="text/event-stream")
+    headers, raw = fetch(compressed_app(events), "gzip")
+    assert "content-encoding" not in headers
+
+    headers, raw = fetch(compressed_app(ORJSONResponse([1] * 200)), "identity")
+    assert "content-encoding" not in headers
+
+
+def test_streamed_body_is_compressed_per_chunk():
+    lines = [orjson.dumps({"id": index}) + b"\n" for index in range(20)]
+    app = compressed_app(StreamingResponse(iter(lines), media_type="application/x-ndjson"))
+
+    headers, raw = fetch(app, "gzip")
+    assert headers["content-encoding"] == "gzip"
+    assert "content-length" not in headers
+    assert gzip.decompress(raw) == b"".join(lines)
+
+
+def test_fields_narrow_the_projection_and_trim_internal_fields(mock_db):
+    async def run():
+        await server.init_demo_data()
+        return (
+            await server.resident_payments_page(server.demo_id("resident:301"), Response(), fields="amount,status"),
+            await server.resident_payments_page(server.demo_id("resident:301"), Response(), fields="amount,concept"),
+        )
+
+    plain, with_concept = asyncio.run(run())
+    assert plain and all(set(payment) == {"amount", "status"} for payment in plain)
+    assert all(set(payment) == {"amount", "concept"} for payment in with_concept)
+    assert with_concept[0]["concept"]["name"]
+
+
+def test_fields_skip_the_concept_lookup(mock_db):
+    async def run():
+        await server.init_demo_data()
+        mock_db.calls.clear()
+        await server.get_resident_payments(Response(), fields="amount,due_date")
+        return list(mock_db.calls)
+
+    calls = asyncio.run(run())
+    assert ("payment_concepts", "find") not in calls
+
+
+def test_sparse_projection():
+    projection, requested = server.sparse_projection("title, id", server.VOTING_PROJECTION, needed=("created_at", "id"))
+    assert projection == {"_id": 0, "created_at": 1, "id": 1, "title": 1}
+    assert requested == {"title", "id"}
+    assert server.sparse_projection(None, server.VOTING_PROJECTION) == (server.VOTING_PROJECTION, None)
+
+    with pytest.raises(server.HTTPException) as error:
+        server.sparse_projection("title,_id,secret", server.VOTING_PROJECTION)
+    assert error.value.status_code == 400
+    assert "_id, secret" in error.value.detail
+    with pytest.raises(server.HTTPException):
+        server.sparse_projection(" , ", server.VOTING_PROJECTION)
+
+
+def test_etag_depends_on_fields(mock_db):
+    async def run():
+        await server.init_demo_data()
+        full, sparse = Response(), Response()
+        await server.get_common_areas(full)
+        areas = await server.get_common_areas(sparse, fields="id,name")
+        return full.headers["etag"], sparse.headers["etag"], orjson.loads(areas.body)
+
+    full, sparse, areas = asyncio.run(run())
+    assert full != sparse
+    assert areas and all(set(area) == {"id", "name"} for area in areas)
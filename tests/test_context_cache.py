@@ -0,0 +1,51 @@
+import asyncio
+
+import server
+
+
+def test_concurrent_misses_share_one_load():
+    cache = server.TTLCache(ttl_seconds=60)
+    loads = []
+
+    async def loader():
+        loads.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": "b1"}
+
+    async def run():
+        results = await asyncio.gather(*[cache.get_or_load("k", loader) for _ in range(20)])
+        await cache.get_or_load("k", loader)
+        return results
+
+    results = asyncio.run(run())
+    assert len(loads) == 1
+    assert all(result == {"id": "b1"} for result in results)
+
+
+def test_invalidate_forces_reload():
+    cache = server.TTLCache(ttl_seconds=60)
+    values = iter(["first", "second"])
+
+    async def loader():
+        return next(values)
+
+    async def run():
+        before = await cache.get_or_load("k", loader)
+        cache.invalidate()
+        after = await cache.get_or_load("k", loader)
+        return before, after
+
+    assert asyncio.run(run()) == ("first", "second")
+
+
+def test_context_served_from_memory(mock_db):
+    async def run():
+        await server.init_demo_data()
+        await server.get_demo_context()
+        mock_db.calls.clear()
+        building, resident = await server.get_demo_context()
+        return building, resident
+
+    building, resident = asyncio.run(run())
+    assert resident["building_id"] == building["id"]
+    assert mock_db.calls == []
@@ -0,0 +1,45 @@
+import asyncio
+
+import orjson
+from fastapi import Response
+
+import server
+
+
+async def _insert_payment(building_id, resident_id, amount, status):
+    payment = server.Payment(resident_id=resident_id, concept_id="c1", amount=amount, due_date="2025-01-15",
+                             status=status, building_id=building_id)
+    await server.db.payments.insert_one(server.prepare_for_mongo(payment.dict()))
+
+
+def test_dashboard_totals_only_the_residents_open_payments(mock_db):
+    async def run():
+        await server.init_demo_data()
+        building, resident = await server.get_demo_context()
+        await server.db.payments.delete_many({})
+        for amount, status in [(100.0, server.PaymentStatus.PENDIENTE), (50.5, server.PaymentStatus.PENDIENTE),
+                               (30.25, server.PaymentStatus.VENCIDO), (999.0, server.PaymentStatus.PAGADO)]:
+            await _insert_payment(building["id"], resident["id"], amount, status)
+        # Another resident of the same building must not be counted
+        for amount, status in [(1000.0, server.PaymentStatus.PENDIENTE), (2000.0, server.PaymentStatus.VENCIDO)]:
+            await _insert_payment(building["id"], "otro-residente", amount, status)
+        return orjson.loads((await server.get_resident_dashboard(Response())).body)
+
+    dashboard = asyncio.run(run())
+    assert dashboard["payments_summary"] == {
+        "pending_count": 2,
+        "pending_total": 150.5,
+        "overdue_count": 1,
+        "overdue_total": 30.25,
+    }
+
+
+def test_dashboard_without_open_payments(mock_db):
+    async def run():
+        await server.init_demo_data()
+        await server.db.payments.delete_many({})
+        return orjson.loads((await server.get_resident_dashboard(Response())).body)
+
+    dashboard = asyncio.run(run())
+    assert dashboard["payments_summary"] == {"pending_count": 0, "pending_total": 0, "overdue_count": 0, "overdue_total": 0}
+    assert dashboard["resident"]["unit_number"] == "301"
@@ -0,0 +1,38 @@
+import asyncio
+from datetime import datetime
+
+import orjson
+from fastapi import Response
+
+import migrate_dates
+import server
+
+
+def test_dates_stored_native_and_served_as_strings(mock_db):
+    async def run():
+        await server.init_demo_data()
+        stored = await server.db.payments.find_one({}, {"_id": 0})
+        served = orjson.loads((await server.get_resident_payments(Response())).body)
+        return stored, served
+
+    stored, served = asyncio.run(run())
+    assert isinstance(stored["due_date"], datetime)
+    assert not isinstance(stored["created_at"], str)
+    assert all(len(payment["due_date"]) == 10 for payment in served)
+
+
+def test_migration_converts_string_dates(mock_db):
+    async def run():
+        await server.db.payments.insert_many([
+            {"id": "p1", "due_date": "2025-01-15", "paid_date": None, "created_at": "2025-01-01T10:00:00+00:00"},
+            {"id": "p2", "due_date": "no es fecha", "created_at": "2025-01-02T10:00:00"},
+        ])
+        result = await migrate_dates.migrate_collection(
+            server.db.payments, ["due_date", "paid_date", "created_at"], batch_size=1, dry_run=False)
+        docs = await server.db.payments.find({}, {"_id": 0}).sort("id", 1).to_list(None)
+        return result, docs
+
+    (migrated, skipped), docs = asyncio.run(run())
+    assert (migrated, skipped) == (2, 0)
+    assert isinstance(docs[0]["due_date"], datetime) and isinstance(docs[0]["created_at"], datetime)
+    assert docs[1]["due_date"] == "no es fecha" and isinstance(docs[1]["created_at"], datetime)
@@ -0,0 +1,92 @@
+import asyncio
+
+from fastapi import Response
+
+import server
+
+
+def test_unchanged_list_answers_304_without_document_query(mock_db):
+    async def run():
+        await server.init_demo_data()
+        first = Response()
+        await server.get_resident_incidents(first)
+        etag = first.headers["etag"]
+
+        mock_db.calls.clear()
+        cached = await server.get_resident_incidents(Response(), if_none_match=etag)
+        return etag, cached, list(mock_db.calls)
+
+    etag, cached, calls = asyncio.run(run())
+    assert cached.status_code == 304
+    assert cached.headers["etag"] == etag
+    assert calls == [("collection_versions", "find_one")]
+
+
+def test_writes_change_the_etag(mock_db):
+    async def run():
+        await server.init_demo_data()
+        before = Response()
+        await server.get_resident_incidents(before)
+        await server.create_incident({"title": "Ruido", "description": "Ruido en la noche",
+                                      "category": "Convivencia", "priority": "BAJA"}, Response())
+        after = Response()
+        body = await server.get_resident_incidents(after, if_none_match=before.headers["etag"])
+        return before.headers["etag"], after.headers["etag"], body.status_code
+
+    before, after, status = asyncio.run(run())
+    assert before != after
+    assert status == 200
+
+
+def test_etag_depends_on_page_parameters(mock_db):
+    async def run():
+        await server.init_demo_data()
+        full, page = Response(), Response()
+        await server.get_resident_payments(full)
+        await server.get_resident_payments(page, limit=1)
+        payments = await mock_db.payments.find_one({"status": "PENDIENTE"}, {"_id": 0, "id": 1})
+        await server.pay_payment(payments["id"], Response())
+        paid = Response()
+        await server.get_resident_payments(paid)
+        return full.headers["etag"], page.headers["etag"], paid.headers["etag"]
+
+    full, page, paid = asyncio.run(run())
+    assert len({full, page, paid}) == 3
+
+
+def test_if_none_match_parsing():
+    etag = 'W/"ab.3.0123"'
+    assert server.etag_matches('"ab.3.0123"', etag)
+    assert server.etag_matches('W/"zz.1.1", W/"ab.3.0123"', etag)
+    assert server.etag_matches("*", etag)
+    assert not server.etag_matches('W/"ab.2.0123"', etag)
+    assert not server.etag_matches(None, etag)
+
+
+def test_dashboard_revalidates_against_its_collections(mock_db):
+    async def run():
+        await server.init_demo_data()
+        first = Response()
+        await server.get_resident_dashboard(first)
+        etag = first.headers["etag"]
+
+        mock_db.calls.clear()
+        cached = await server.get_resident_dashboard(Response(), if_none_match=etag)
+        calls = list(mock_db.calls)
+
+        building = await server.get_demo_building()
+        await server.bump_collection_version(mock_db, "common_areas", building["id"])
+        unrelated = Response()
+        await server.get_resident_dashboard(unrelated)
+
+        await server.create_incident({"title": "Ruido", "description": "Ruido en la noche",
+                                      "category": "Convivencia", "priority": "BAJA"}, Response())
+        changed = await server.get_resident_dashboard(Response(), if_none_match=etag)
+        return etag, cached, calls, unrelated.headers["etag"], changed
+
+    etag, cached, calls, unrelated, changed = asyncio.run(run())
+    assert cached.status_code == 304
+    assert calls == [("collection_versions", "find")]
+    assert unrelated == etag
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+def test_slow_client_gets_resync_instead_of_growing_queue():
+    hub = server.EventHub(queue_size=2)
+    slow = hub.subscribe("b1")
+    other = hub.subscribe("b2")
+    for version in range(1, 6):
+        hub.publish("b1", {"type": "change", "collection": "incidents", "version": version})
+
+    assert slow.qsize() <= 2
+    assert slow.get_nowait() == {"type": "resync"}
+    assert other.empty()
+
+    hub.unsubscribe("b1", slow)
+    hub.unsubscribe("b2", other)
+    assert hub.clients == 0
+    assert hub.subscribers == {}
+
+
+def test_subscriptions_are_capped():
+    hub = server.EventHub(max_clients=1)
+    hub.subscribe("b1")
+    with pytest.raises(HTTPException) as error:
+        hub.subscribe("b1")
+    assert error.value.status_code == 503
+
+
+def test_polling_fans_out_version_bumps(mock_db):
+    hub = server.EventHub()
+
+    async def run():
+        await server.init_demo_data()
+        building = await server.get_demo_building()
+        queue = hub.subscribe(building["id"])
+        state = {"watermark": server.datetime.now(server.timezone.utc), "delivered": {}}
+        async for doc in mock_db.collection_versions.find({}):
+            state["delivered"][doc["_id"]] = doc["version"]
+
+        idle = await server.poll_collection_versions(mock_db, hub, state)
+        await server.create_incident({"title": "Ruido", "description": "Ruido en la noche",
+                                      "category": "Convivencia", "priority": "BAJA"}, Response())
+        published = await server.poll_collection_versions(mock_db, hub, state)
+        # A second pass over the overlap window does not repeat the event
+        repeated = await server.poll_collection_versions(mock_db, hub, state)
+        return idle, published, repeated, queue.get_nowait()
+
+    idle, published, repeated, event = asyncio.run(run())
+    assert (idle, published, repeated) == (0, 1, 0)
+    assert event == {"type": "change", "collection": "incidents", "version": 2}
+
+
+def test_event_stream_sends_ready_then_changes(mock_db):
+    async def run():
+        await server.init_demo_data()
+        response = await server.stream_events()
+        stream = response.body_iterator
+        first = await stream.__anext__()
+        building = await server.get_demo_building()
+        server.event_hub.publish(building["id"], {"type": "change", "collection": "votings", "version": 3})
+        second = await stream.__anext__()
+        await stream.aclose()
+        return first, second, server.event_hub.clients
+
+    first, second, clients = asyncio.run(run())
+    assert first.startswith("retry: 5000\n\nevent: ready\n")
+    assert second == 'event: change\ndata: {"type":"change","collection":"votings","version":3}\n\n'
+    assert clients == 0
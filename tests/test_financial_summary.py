@@ -0,0 +1,31 @@
+import asyncio
+
+from fastapi import Response
+
+import server
+
+
+def _rebuilt_cells(building_id):
+    async def run():
+        rows = await server.db.payments.aggregate(server.financial_summary_pipeline(building_id)).to_list(None)
+        return rows[0]["cells"]
+    return run()
+
+
+def test_incremental_summary_matches_rebuild(mock_db):
+    async def run():
+        await server.init_demo_data()
+        building, resident = await server.get_demo_context()
+        pending = await server.db.payments.find_one({"status": "PENDIENTE"})
+        await server.pay_payment(pending["id"], Response())
+        await server.run_billing(server.db, building["id"], "2020-05")
+        await server.sweep_overdue_payments(server.db)
+        stored = await server.db.financial_summaries.find_one({"_id": building["id"]})
+        return stored["cells"], await _rebuilt_cells(building["id"]), await server.get_financial_summary()
+
+    stored, rebuilt, summary = asyncio.run(run())
+    assert {cell: values for cell, values in stored.items() if values["count"]} == rebuilt
+    assert summary["totals"]["overdue"]["count"] == 1 + 4
+    assert summary["totals"]["collected"]["count"] == 2
+    assert summary["totals"]["pending"]["count"] == 0
+    assert all(concept["name"] for concept in summary["by_concept"])
@@ -0,0 +1,45 @@
+import asyncio
+
+import orjson
+
+import server
+
+
+def test_readiness_pings_database(mock_db):
+    assert asyncio.run(server.readiness())["status"] == "ready"
+
+
+def test_readiness_before_startup(monkeypatch):
+    monkeypatch.setattr(server, "db", None)
+    response = asyncio.run(server.readiness())
+    assert response.status_code == 503
+    assert orjson.loads(response.body)["status"] == "starting"
+
+
+def test_pool_metrics_track_checkouts():
+    metrics = server.PoolMetrics()
+    for _ in range(2):
+        metrics.connection_created(None)
+        metrics.connection_check_out_started(None)
+        metrics.connection_checked_out(None)
+    metrics.connection_checked_in(None)
+    metrics.connection_check_out_started(None)
+    metrics.connection_check_out_failed(None)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["open"] == 2
+    assert snapshot["checked_out"] == 1
+    assert snapshot["max_checked_out"] == 2
+    assert snapshot["checkouts"] == 2
+    assert snapshot["checkout_failures"] == 1
+    assert snapshot["waiting"] == 0
+
+
+def test_client_options_from_environment(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "20")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "500")
+    monkeypatch.delenv("MONGO_MIN_POOL_SIZE", raising=False)
+    options = server.mongo_client_options()
+    assert options["maxPoolSize"] == 20
+    assert options["waitQueueTimeoutMS"] == 500
+    assert "minPoolSize" not in options
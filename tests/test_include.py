@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+def test_vote_returns_results_and_votings(mock_db):
+    async def run():
+        await server.init_demo_data()
+        voting = await mock_db.votings.find_one({}, {"_id": 0})
+        mock_db.calls.clear()
+        result = await server.cast_vote({"voting_id": voting["id"], "option": voting["options"][0]},
+                                        Response(), include="votings,results")
+        return voting, result, [call for call in mock_db.calls if call[0] == "vote_tallies"]
+
+    voting, result, tally_calls = asyncio.run(run())
+    assert [v["id"] for v in result["votings"]] == [voting["id"]]
+    assert result["results"]["total_votes"] == 1
+    assert result["results"]["results"][0]["votes"] == 1
+    # The results come from the increment, not from another read
+    assert tally_calls == [("vote_tallies", "find_one_and_update")]
+
+
+def test_incident_returns_refreshed_list(mock_db):
+    async def run():
+        await server.init_demo_data()
+        return await server.create_incident({"title": "Goteo", "description": "Goteo en el techo",
+                                             "category": "Plomería", "priority": "MEDIA"},
+                                            Response(), include="incidents")
+
+    result = asyncio.run(run())
+    assert result["incidents"][0]["id"] == result["incident"]["id"]
+    assert len(result["incidents"]) == 3
+
+
+def test_unknown_include_is_rejected_before_writing(mock_db):
+    async def run():
+        await server.init_demo_data()
+        with pytest.raises(HTTPException) as error:
+            await server.create_incident({"title": "x", "description": "x", "category": "x", "priority": "BAJA"},
+                                         Response(), include="incidents,residents")
+        return error.value, await mock_db.incidents.count_documents({})
+
+    error, incidents = asyncio.run(run())
+    assert error.status_code == 400
+    assert incidents == 2
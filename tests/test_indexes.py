@@ -0,0 +1,123 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+import server
+
+IXSCAN = {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "resident_id_1"}}
+COLLSCAN = {"stage": "COLLSCAN", "direction": "forward"}
+OR_WITH_COLLSCAN = {
+    "stage": "SUBPLAN",
+    "inputStage": {"stage": "OR", "inputStages": [
+        {"stage": "IXSCAN", "indexName": "id_1"},
+        {"stage": "COLLSCAN", "direction": "forward"},
+    ]},
+}
+SBE_COLLSCAN = {"queryPlan": {"stage": "COLLSCAN", "planNodeId": 1}, "slotBasedPlan": {"slots": "", "stages": ""}}
+
+
+class ExplainDatabase:
+    # Answers explain commands with a canned winning plan per collection
+    def __init__(self, plans):
+        self.plans = plans
+        self.explained = []
+
+    async def command(self, command):
+        collection = command["explain"]["find"]
+        self.explained.append(collection)
+        return {"queryPlanner": {"winningPlan": self.plans.get(collection, IXSCAN)}}
+
+
+@pytest.mark.parametrize("plan", [COLLSCAN, OR_WITH_COLLSCAN, SBE_COLLSCAN])
+def test_audit_fails_on_collscan(plan):
+    database = ExplainDatabase({"payment_concepts": plan})
+    with pytest.raises(RuntimeError) as error:
+        asyncio.run(server.audit_query_plans(database))
+
+    offenders = str(error.value).splitlines()[1:]
+    assert offenders and all("payment_concepts" in line for line in offenders)
+    assert len(database.explained) == len(server.ROUTE_QUERIES)
+
+
+def test_audit_passes_on_index_plans():
+    database = ExplainDatabase({"incidents": {"queryPlan": IXSCAN}})
+    asyncio.run(server.audit_query_plans(database))
+    assert server._plan_stages(OR_WITH_COLLSCAN) == ["SUBPLAN", "OR", "IXSCAN", "COLLSCAN"]
+
+
+def index_serves(keys, query):
+    # Equality/range filter fields must lead the index, and a sort must follow
+    # on from them in index order (or fully reversed)
+    fields = [field for field, _ in keys]
+    prefix = 0
+    while prefix < len(fields) and fields[prefix] in query["filter"]:
+        prefix += 1
+    sort = list(query.get("sort", {}).items())
+    if not sort:
+        return prefix > 0
+    reverse = [(field, -direction) for field, direction in sort]
+    return any(keys[start:start + len(sort)] in (sort, reverse) for start in range(1, prefix + 1))
+
+
+@pytest.mark.parametrize("query", server.ROUTE_QUERIES, ids=lambda query: f"{query['route']} {query['collection']}")
+def test_route_queries_have_an_index(query):
+    indexes = [list(model.document["key"].items()) for model in server.INDEX_SPECS.get(query["collection"], [])]
+    assert any(index_serves(keys, query) for keys in indexes)
+
+
+class FakeCollection:
+    def __init__(self, name, failures, calls):
+        self.name = name
+        self.failures = failures
+        self.calls = calls
+
+    async def create_index(self, keys, **spec):
+        self.calls.append(("create_index", self.name, spec["name"]))
+        pending = self.failures.get((self.name, spec["name"]))
+        if pending:
+            raise pending.pop(0)
+
+    async def drop_index(self, name):
+        self.calls.append(("drop_index", self.name, name))
+
+
+class FakeDatabase:
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = []
+
+    def __getitem__(self, name):
+        return FakeCollection(name, self.failures, self.calls)
+
+
+def test_conflicting_index_is_dropped_and_rebuilt():
+    database = FakeDatabase({("payments", "billing_key_1"): [OperationFailure("options differ", code=85)]})
+    asyncio.run(server.ensure_indexes(database))
+
+    rebuilt = [call for call in database.calls if call[1:] == ("payments", "billing_key_1")]
+    assert rebuilt == [("create_index", "payments", "billing_key_1"),
+                       ("drop_index", "payments", "billing_key_1"),
+                       ("create_index", "payments", "billing_key_1")]
+
+
+def test_rebuilt_index_resolves_duplicates(monkeypatch):
+    resolved = []
+
+    async def resolve(database):
+        resolved.append(database)
+
+    monkeypatch.setitem(server.DUPLICATE_RESOLVERS, "votes", resolve)
+    database = FakeDatabase({("votes", "voting_id_1_resident_id_1"): [
+        OperationFailure("key spec differs", code=86), DuplicateKeyError("dup"),
+    ]})
+    asyncio.run(server.ensure_indexes(database))
+
+    assert resolved == [database]
+    assert database.calls.count(("create_index", "votes", "voting_id_1_resident_id_1")) == 3
+
+
+def test_unrelated_index_errors_propagate():
+    database = FakeDatabase({("users", "id_1"): [OperationFailure("not authorized", code=13)]})
+    with pytest.raises(OperationFailure):
+        asyncio.run(server.ensure_indexes(database))
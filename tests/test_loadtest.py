@@ -0,0 +1,38 @@
+import asyncio
+
+import loadtest
+import server
+
+
+def test_benchmark_drives_every_route(monkeypatch):
+    monkeypatch.setattr(server, "db", server.db)
+    args = loadtest.parse_args(["--units", "5", "--months", "2", "--requests", "4", "--warmup", "1",
+                                "--concurrency", "2"])
+    results = asyncio.run(loadtest.run_benchmark(args))
+    server.invalidate_demo_context()
+    server.forget_demo_seed()
+    server.availability_index.invalidate()
+
+    assert set(results) == {name for name, *_ in loadtest.build_routes({"area_id": "a", "voting_id": "v"})}
+    # Write routes included: a reused vote, payment or slot would answer 4xx
+    assert {"POST /api/vote", "POST /api/payments/{payment_id}/pay", "POST /api/reservations",
+            "POST /api/reservations/{reservation_id}/cancel"} <= set(results)
+    for name, result in results.items():
+        assert result["statuses"] == {"200": 4}, name
+        assert result["p50_ms"] <= result["p95_ms"] <= result["p99_ms"]
+
+
+def test_regressions_compare_p95_with_tolerance():
+    baseline = {"GET /api/payments": {"p95_ms": 10.0}, "GET /api/votings": {"p95_ms": 0.2}}
+    results = {"GET /api/payments": {"p95_ms": 13.0}, "GET /api/votings": {"p95_ms": 0.9},
+               "GET /api/incidents": {"p95_ms": 50.0}}
+    assert loadtest.find_regressions(results, baseline, 0.25) == [("GET /api/payments", 10.0, 13.0)]
+
+
+def test_aggregate_bound_routes_skipped_under_mongomock():
+    baseline = {"GET /api/resident/dashboard": {"p95_ms": 10.0}}
+    results = {"GET /api/resident/dashboard": {"p95_ms": 40.0}}
+    mongomock = loadtest.unchecked_routes(loadtest.parse_args([]))
+    mongod = loadtest.unchecked_routes(loadtest.parse_args(["--mongo-url", "mongodb://localhost"]))
+    assert loadtest.find_regressions(results, baseline, 0.25, mongomock) == []
+    assert loadtest.find_regressions(results, baseline, 0.25, mongod) == [("GET /api/resident/dashboard", 10.0, 40.0)]
@@ -0,0 +1,54 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+
+import server
+
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = server.Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 2.0):
+        histogram.observe(value, ("/api/x",))
+
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{route="/api/x",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{route="/api/x",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/api/x"} 3' in lines
+
+
+def test_command_listener_times_collections_and_requests():
+    listener = server.CommandMetrics()
+    trace = server.RequestTrace()
+    token = server.request_trace.set(trace)
+    try:
+        listener.started(SimpleNamespace(command_name="find", command={"find": "metrics_probe", "filter": {}},
+                                         connection_id=("h", 1), request_id=7))
+        listener.succeeded(SimpleNamespace(command_name="find", connection_id=("h", 1), request_id=7,
+                                           duration_micros=2500, reply={"cursor": {"firstBatch": [{}, {}]}}))
+    finally:
+        server.request_trace.reset(token)
+
+    assert trace.db_seconds == 0.0025
+    assert trace.commands[0]["docs"] == 2
+    assert server.mongo_command_duration.values[("find", "metrics_probe")]["count"] == 1
+
+
+def test_middleware_labels_requests_by_route_template(mock_db):
+    pay_404 = ("POST", "/api/payments/{payment_id}/pay", 404)
+    before = server.http_requests_total.values.get(pay_404, 0)
+
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            await http.get("/api/init-demo")
+            await http.post("/api/payments/no-such-payment/pay")
+            return (await http.get("/metrics")).text
+
+    body = asyncio.run(run())
+    assert server.http_requests_total.values[pay_404] == before + 1
+    assert 'http_requests_total{method="POST",route="/api/payments/{payment_id}/pay",status="404"}' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/init-demo"}' in body
+    assert "http_requests_in_flight 1" in body
+    assert "# TYPE mongodb_pool_open gauge" in body
@@ -0,0 +1,24 @@
+import asyncio
+from datetime import timedelta
+
+import server
+
+
+def test_sweeper_marks_past_due_payments_once(mock_db):
+    async def run():
+        await server.init_demo_data()
+        building = await server.db.buildings.find_one({"is_demo": True})
+        late = server.Payment(resident_id="r1", concept_id="c1", amount=10.0, due_date="2020-01-01",
+                              status=server.PaymentStatus.PENDIENTE, building_id=building["id"])
+        await server.db.payments.insert_one(server.prepare_for_mongo(late.dict()))
+        first = await server.sweep_overdue_payments(server.db)
+        second = await server.sweep_overdue_payments(server.db)
+        tomorrow = await server.sweep_overdue_payments(server.db, server.today_utc() + timedelta(days=1))
+        stored = await server.db.payments.find_one({"id": late.id})
+        return first, second, tomorrow, stored
+
+    first, second, tomorrow, stored = asyncio.run(run())
+    assert first["modified"] == 1
+    assert second["skipped"] is True
+    assert tomorrow["skipped"] is False
+    assert stored["status"] == server.PaymentStatus.VENCIDO
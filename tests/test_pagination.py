@@ -0,0 +1,47 @@
+import asyncio
+
+import orjson
+import pytest
+from fastapi import HTTPException, Response
+
+import server
+
+
+async def _report_incidents(count):
+    await server.init_demo_data()
+    for i in range(count):
+        await server.create_incident({
+            "title": f"Incidencia {i}",
+            "description": "Prueba de paginación",
+            "category": "Mantenimiento",
+            "priority": "BAJA",
+        }, Response())
+
+
+def test_pages_cover_every_incident_once(mock_db):
+    async def run():
+        await _report_incidents(7)
+        full = orjson.loads((await server.get_resident_incidents(Response())).body)
+        pages = []
+        after = None
+        while True:
+            response = Response()
+            page = await server.get_resident_incidents(response, limit=3, after=after)
+            pages.append(orjson.loads(page.body))
+            after = page.headers.get("X-Next-Cursor")
+            if not after:
+                return full, pages
+
+    full, pages = asyncio.run(run())
+    assert [len(page) for page in pages] == [3, 3, 3]
+    assert [i["id"] for page in pages for i in page] == [i["id"] for i in full]
+
+
+def test_invalid_cursor_is_rejected(mock_db):
+    async def run():
+        await _report_incidents(1)
+        with pytest.raises(HTTPException) as error:
+            await server.get_resident_incidents(Response(), after="not-a-cursor")
+        return error.value
+
+    assert asyncio.run(run()).status_code == 400
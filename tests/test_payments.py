@@ -0,0 +1,47 @@
+import asyncio
+
+import orjson
+from fastapi import Response
+
+import server
+
+
+async def _add_payments(database, count):
+    building = await database.buildings.find_one({"is_demo": True})
+    resident = await database.residents.find_one({"building_id": building["id"]})
+    concepts = await database.payment_concepts.find({"building_id": building["id"]}).to_list(10)
+    for i in range(count):
+        payment = server.Payment(
+            resident_id=resident["id"],
+            concept_id=concepts[i % len(concepts)]["id"],
+            amount=100.0,
+            due_date="2025-01-01",
+            status=server.PaymentStatus.PENDIENTE,
+            building_id=building["id"],
+        )
+        await database.payments.insert_one(server.prepare_for_mongo(payment.dict()))
+
+
+def _count_payment_calls(database, extra_payments):
+    async def run():
+        await server.init_demo_data()
+        await _add_payments(database, extra_payments)
+        await server.get_demo_context()
+        database.calls.clear()
+        payments = orjson.loads((await server.get_resident_payments(Response())).body)
+        return payments, len(database.calls)
+    return asyncio.run(run())
+
+
+def test_payments_resolve_concepts(mock_db):
+    payments, _ = _count_payment_calls(mock_db, 0)
+    assert len(payments) == 3
+    assert all(payment["concept"]["id"] == payment["concept_id"] for payment in payments)
+
+
+def test_payments_db_calls_are_constant(mock_db):
+    few_payments, few_calls = _count_payment_calls(mock_db, 1)
+    mock_db.calls.clear()
+    many_payments, many_calls = _count_payment_calls(mock_db, 50)
+    assert len(many_payments) > len(few_payments)
+    assert few_calls == many_calls
@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+def _booking(area, start_time, end_time):
+    return {
+        "common_area_id": area["id"],
+        "date": "2030-01-15",
+        "start_time": start_time,
+        "end_time": end_time,
+        "total_cost": area["price_per_hour"],
+    }
+
+
+async def _gym():
+    await server.init_demo_data()
+    return await server.db.common_areas.find_one({"name": "Gimnasio"}, {"_id": 0})
+
+
+def test_overlapping_reservation_is_rejected(mock_db):
+    async def run():
+        area = await _gym()
+        await server.create_reservation(_booking(area, "10:00", "12:00"))
+        await server.create_reservation(_booking(area, "12:00", "13:00"))
+        with pytest.raises(HTTPException) as error:
+            await server.create_reservation(_booking(area, "11:30", "12:30"))
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 409
+
+
+def test_concurrent_overlapping_bookings_allow_one(mock_db):
+    async def run():
+        area = await _gym()
+        bookings = [_booking(area, f"{hour:02d}:00", f"{hour + 2:02d}:00") for hour in (14, 15, 15, 14)]
+        return await asyncio.gather(*[server.create_reservation(b) for b in bookings], return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert len([r for r in results if not isinstance(r, Exception)]) == 1
+    assert all(r.status_code == 409 for r in results if isinstance(r, Exception))
+
+
+def test_reservation_outside_opening_hours(mock_db):
+    async def run():
+        area = await _gym()
+        with pytest.raises(HTTPException) as error:
+            await server.create_reservation(_booking(area, "05:00", "06:00"))
+        return error.value
+
+    assert asyncio.run(run()).status_code == 400
+
+
+def test_availability_tracks_create_and_cancel(mock_db):
+    async def run():
+        area = await _gym()
+        day = {"start_date": "2030-01-15", "end_date": "2030-01-15"}
+        before = await server.get_area_availability(area["id"], **day)
+        created = await server.create_reservation(_booking(area, "10:00", "12:00"))
+        during = await server.get_area_availability(area["id"], **day)
+        await server.cancel_reservation(created["reservation"]["id"])
+        after = await server.get_area_availability(area["id"], **day)
+        return before, during, after
+
+    before, during, after = asyncio.run(run())
+    assert before["days"][0]["free"] == [{"start_time": "06:00", "end_time": "22:00"}]
+    assert during["days"][0]["free"] == [
+        {"start_time": "06:00", "end_time": "10:00"},
+        {"start_time": "12:00", "end_time": "22:00"},
+    ]
+    assert after["days"][0]["free"] == before["days"][0]["free"]
+
+
+async def _legacy_reservation(area, start_time, end_time):
+    # Stored directly, as bookings made before times were validated
+    building, resident = await server.get_demo_context()
+    reservation = server.Reservation(common_area_id=area["id"], resident_id=resident["id"], date="2030-01-15",
+                                     start_time=start_time, end_time=end_time,
+                                     status=server.ReservationStatus.CONFIRMADA, total_cost=0)
+    await server.db.reservations.insert_one(server.prepare_for_mongo(reservation.dict()))
+    return reservation.id
+
+
+def test_backfill_skips_legacy_times(mock_db):
+    async def run():
+        area = await _gym()
+        legacy = [await _legacy_reservation(area, "21:00", "27:00"), await _legacy_reservation(area, "19:15", "20:00")]
+        valid = await _legacy_reservation(area, "08:00", "09:00")
+        await server.db.reservation_slots.delete_many({})
+        await server.backfill_reservation_slots(server.db)
+        return valid, await server.db.reservation_slots.find(
+            {"reservation_id": {"$in": [*legacy, valid]}}, {"_id": 0}).to_list(None)
+
+    valid, slots = asyncio.run(run())
+    assert {slot["reservation_id"] for slot in slots} == {valid}
+    assert len(slots) == 2
+
+
+def test_cancel_legacy_reservation(mock_db):
+    async def run():
+        area = await _gym()
+        reservation_id = await _legacy_reservation(area, "21:00", "27:00")
+        day = {"start_date": "2030-01-15", "end_date": "2030-01-15"}
+        await server.get_area_availability(area["id"], **day)
+        version = await server.db.collection_versions.find_one({"_id": f"reservations:{area['building_id']}"})
+        result = await server.cancel_reservation(reservation_id)
+        bumped = await server.db.collection_versions.find_one({"_id": f"reservations:{area['building_id']}"})
+        return result, version, bumped, server.availability_index.get(area["id"], "2030-01-15")
+
+    result, version, bumped, cached = asyncio.run(run())
+    assert result["reservation"]["status"] == server.ReservationStatus.CANCELADA
+    assert bumped["version"] == version["version"] + 1
+    assert cached is None
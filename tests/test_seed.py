@@ -0,0 +1,25 @@
+import asyncio
+import random
+
+import server
+from seed import BulkInserter, seed_building
+
+
+def test_seeded_votes_are_tallied(mock_db):
+    async def run():
+        inserter = BulkInserter(server.db, batch_size=50, concurrency=2)
+        await seed_building(inserter, random.Random(7), 0, 20, 1, 0, 3)
+        await inserter.close()
+        checks = []
+        async for voting in server.db.votings.find({}, {"_id": 0, "id": 1}):
+            results = await server.get_voting_results(voting["id"])
+            stored = await server.db.votes.count_documents({"voting_id": voting["id"]})
+            checks.append((results["total_votes"], sum(r["votes"] for r in results["results"]), stored))
+        return checks, await server.reconcile_vote_tallies(server.db)
+
+    checks, reconciled = asyncio.run(run())
+    assert len(checks) == 3
+    assert any(stored for *_, stored in checks)
+    for total, per_option, stored in checks:
+        assert total == per_option == stored
+    assert reconciled["drift"] == []
@@ -0,0 +1,149 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+
+
+def test_lock_is_exclusive_until_expired(mock_db):
+    async def run():
+        first = await server.acquire_lock(mock_db, "startup", "worker-a")
+        second = await server.acquire_lock(mock_db, "startup", "worker-b")
+        renewed = await server.acquire_lock(mock_db, "startup", "worker-a")
+        await mock_db.init_locks.update_one(
+            {"_id": "startup"}, {"$set": {"expires_at": datetime.now(timezone.utc) - timedelta(seconds=1)}}
+        )
+        taken_over = await server.acquire_lock(mock_db, "startup", "worker-b")
+        return first, second, renewed, taken_over
+
+    assert asyncio.run(run()) == (True, False, True, True)
+
+
+def test_concurrent_workers_seed_once(mock_db):
+    async def run():
+        roles = await asyncio.gather(*[server.run_startup_init(mock_db) for _ in range(4)])
+        buildings = await mock_db.buildings.count_documents({"is_demo": True})
+        payments = await mock_db.payments.count_documents({})
+        return roles, buildings, payments
+
+    roles, buildings, payments = asyncio.run(run())
+    assert sorted(roles) == ["follower", "follower", "follower", "leader"]
+    assert buildings == 1
+    assert payments == 3
+
+
+def test_interrupted_seed_completes_without_duplicates(mock_db):
+    async def run():
+        await server.init_demo_data()
+        # Simulate a seed that died before writing its marker and some documents
+        await mock_db.init_state.delete_one({"_id": "demo_data"})
+        await mock_db.incidents.delete_many({})
+        server.forget_demo_seed()
+        await server.init_demo_data()
+        return (
+            await mock_db.buildings.count_documents({}),
+            await mock_db.incidents.count_documents({}),
+            await mock_db.payments.count_documents({}),
+            await mock_db.financial_summaries.find_one({}),
+        )
+
+    buildings, incidents, payments, summary = asyncio.run(run())
+    assert (buildings, incidents, payments) == (1, 2, 3)
+    assert sum(cell["count"] for cell in summary["cells"].values()) == 3
+
+
+def test_exclusive_job_skips_when_lock_is_held(mock_db):
+    calls = []
+
+    async def job():
+        calls.append(1)
+        return {"ran": True}
+
+    async def run():
+        await server.acquire_lock(mock_db, "job:sweeper", "other-worker")
+        skipped = await server.run_exclusive(mock_db, "sweeper", job)()
+        await server.release_lock(mock_db, "job:sweeper", "other-worker")
+        ran = await server.run_exclusive(mock_db, "sweeper", job)()
+        return skipped, ran
+
+    skipped, ran = asyncio.run(run())
+    assert skipped == {"skipped": "running in another worker"}
+    assert ran == {"ran": True}
+    assert len(calls) == 1
+
+
+def test_init_demo_answers_from_memory_after_first_check(mock_db):
+    async def run():
+        await server.init_demo_data()
+        mock_db.calls.clear()
+        before = server.demo_init_requests.values.get(("memory",), 0)
+        for _ in range(5):
+            await server.initialize_demo_data()
+        return list(mock_db.calls), server.demo_init_requests.values[("memory",)] - before
+
+    calls, memory_hits = asyncio.run(run())
+    assert calls == []
+    assert memory_hits == 5
+
+
+def test_seed_version_change_reseeds(mock_db, monkeypatch):
+    async def run():
+        await server.init_demo_data()
+        await mock_db.incidents.delete_many({})
+        # Another worker, or a restart, after the seed gained a version
+        monkeypatch.setattr(server, "SEED_VERSION", server.SEED_VERSION + 1)
+        server.forget_demo_seed()
+        await server.init_demo_data()
+        marker = await mock_db.init_state.find_one({"_id": "demo_data"})
+        return marker["version"], await mock_db.incidents.count_documents({})
+
+    version, incidents = asyncio.run(run())
+    assert version == server.SEED_VERSION
+    assert incidents == 2
+
+
+def test_missing_demo_building_reseeds(mock_db):
+    async def run():
+        await server.init_demo_data()
+        await mock_db.buildings.delete_many({})
+        server.invalidate_demo_context()
+        with pytest.raises(server.HTTPException):
+            await server.get_demo_building()
+        await server.init_demo_data()
+        return await mock_db.buildings.count_documents({"is_demo": True}), await server.get_demo_building()
+
+    buildings, building = asyncio.run(run())
+    assert buildings == 1
+    assert building["id"] == server.demo_id("building")
+
+
+def test_query_plan_audit_runs_on_every_start(mock_db, monkeypatch):
+    audited = []
+
+    async def audit(database):
+        audited.append(database)
+
+    monkeypatch.setattr(server, "audit_query_plans", audit)
+    monkeypatch.setenv("QUERY_PLAN_AUDIT", "1")
+
+    async def run():
+        return [await server.run_startup_init(mock_db) for _ in range(2)]
+
+    assert asyncio.run(run()) == ["leader", "follower"]
+    assert audited == [mock_db, mock_db]
+
+
+def test_query_plan_audit_failure_stops_startup(mock_db, monkeypatch):
+    async def audit(database):
+        raise RuntimeError("Route queries falling back to COLLSCAN")
+
+    monkeypatch.setattr(server, "audit_query_plans", audit)
+    monkeypatch.setenv("QUERY_PLAN_AUDIT", "1")
+
+    async def run():
+        await server.run_startup_once(mock_db)
+        await server.run_startup_init(mock_db)
+
+    with pytest.raises(RuntimeError, match="COLLSCAN"):
+        asyncio.run(run())
@@ -0,0 +1,44 @@
+import asyncio
+import logging
+
+import httpx
+
+import server
+
+
+def test_query_shape_hides_values():
+    command = {
+        "find": "payments",
+        "filter": {"resident_id": "r1", "status": {"$in": ["PENDIENTE", "VENCIDO"]}},
+        "sort": {"due_date": -1},
+    }
+    assert server.command_shape("find", command) == {
+        "filter": {"resident_id": "?", "status": {"$in": ["?"]}},
+        "sort": {"due_date": -1},
+    }
+    assert server.command_shape("update", {"updates": [{"q": {"id": "p1"}, "u": {}}]}) == {"id": "?"}
+    assert server.command_shape("insert", {"documents": [{}]}) is None
+
+
+def test_reply_documents():
+    assert server.reply_documents({"cursor": {"nextBatch": [{}, {}, {}]}}) == 3
+    assert server.reply_documents({"n": 4, "nModified": 4}) == 4
+    assert server.reply_documents({"value": None}) == 0
+
+
+def test_debug_header_logs_request_and_adds_headers(mock_db, caplog):
+    async def run():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            traced = await http.get("/api/", headers={"X-Debug-Trace": "1"})
+            plain = await http.get("/api/")
+            return traced, plain
+
+    with caplog.at_level(logging.INFO, logger="server.trace"):
+        traced, plain = asyncio.run(run())
+
+    assert traced.headers["x-db-calls"] == "0"
+    assert "x-db-calls" not in plain.headers
+    messages = [record.getMessage() for record in caplog.records if record.name == "server.trace"]
+    assert len(messages) == 1
+    assert messages[0].startswith("Traced request GET /api/ -> 200")
@@ -0,0 +1,66 @@
+import asyncio
+
+from fastapi import Response
+
+import server
+
+
+async def _demo_voting():
+    await server.init_demo_data()
+    return await server.db.votings.find_one({"status": "ACTIVA"}, {"_id": 0})
+
+
+def test_vote_updates_results(mock_db):
+    async def run():
+        voting = await _demo_voting()
+        await server.cast_vote({"voting_id": voting["id"], "option": voting["options"][1]}, Response())
+        return voting, await server.get_voting_results(voting["id"])
+
+    voting, results = asyncio.run(run())
+    assert results["total_votes"] == 1
+    assert [r["votes"] for r in results["results"]] == [0, 1, 0]
+    assert results["results"][1]["option"] == voting["options"][1]
+
+
+def test_reconcile_rebuilds_drifted_tallies(mock_db):
+    async def run():
+        voting = await _demo_voting()
+        await server.cast_vote({"voting_id": voting["id"], "option": voting["options"][0]}, Response())
+        await server.db.vote_tallies.update_one({"voting_id": voting["id"]}, {"$inc": {"counts.0": 5, "total": 5}})
+        first = await server.reconcile_vote_tallies(server.db)
+        second = await server.reconcile_vote_tallies(server.db)
+        return first, second, await server.get_voting_results(voting["id"])
+
+    first, second, results = asyncio.run(run())
+    assert len(first["drift"]) == 1
+    assert second["drift"] == []
+    assert results["total_votes"] == 1
+
+
+def test_parallel_votes_count_once(mock_db):
+    async def run():
+        voting = await _demo_voting()
+        votes = [{"voting_id": voting["id"], "option": voting["options"][i % 3]} for i in range(10)]
+        outcomes = await asyncio.gather(*[server.cast_vote(v, Response()) for v in votes], return_exceptions=True)
+        stored = await server.db.votes.count_documents({"voting_id": voting["id"]})
+        return outcomes, stored, await server.get_voting_results(voting["id"])
+
+    outcomes, stored, results = asyncio.run(run())
+    rejected = [o for o in outcomes if isinstance(o, Exception)]
+    assert len(outcomes) - len(rejected) == 1
+    assert all(o.status_code == 400 for o in rejected)
+    assert stored == 1
+    assert results["total_votes"] == 1
+
+
+def test_duplicate_votes_removed_when_index_is_built(mock_db):
+    async def run():
+        voting = await _demo_voting()
+        await server.db.votes.drop_indexes()
+        for option in voting["options"][:2]:
+            vote = server.Vote(voting_id=voting["id"], resident_id="r1", option=option)
+            await server.db.votes.insert_one(server.prepare_for_mongo(vote.dict()))
+        await server.ensure_indexes(server.db)
+        return await server.db.votes.count_documents({"resident_id": "r1"})
+
+    assert asyncio.run(run()) == 1